@@ -1,13 +1,27 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context, g, has_request_context
+from flask import before_render_template, template_rendered
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from flask_sqlalchemy.session import Session as BaseSession
+from flask_migrate import Migrate
+from sqlalchemy import case, delete, event, func, insert, lambda_stmt, literal, select, text, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.orm import contains_eager, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from datetime import datetime, timedelta, timezone
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.utils import secure_filename
 import os
-import pandas as pd
-from io import BytesIO
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
 from flask import send_file
 import random
-from math import radians, sin, cos, sqrt, atan2
+from route_optimizer import haversine_distance, optimize_route, plan_fleet_routes
+from geocoding import geocode
+from metrics import COUNT_BUCKETS, SQL_BUCKETS, MetricsRegistry
+from eventlog import EventLog
+from delivery_pdf import render_day_manifest, render_delivery_slip
 from flask import make_response
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, A4
@@ -16,15 +30,156 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 import io
+import base64
+import hmac
+import multiprocessing
+import csv
+import json
+import tempfile
+import uuid
+from collections import deque
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
+import queue
+import re
+import sqlite3
+import threading
+import time
 
 
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here-change-in-production'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///manqinenyathi.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///manqinenyathi.db')\
+    .replace('postgres://', 'postgresql://', 1)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db = SQLAlchemy(app)
+app.config['DASHBOARD_STATS_TTL'] = 30  # seconds
+app.config['STREAM_KEEPALIVE_SECONDS'] = 15
+app.config['DEPOT_COORDINATES'] = (-26.2041, 28.0473)  # Johannesburg
+app.config['ROUTE_SOLVER_TIME_BUDGET'] = 0.25  # seconds
+app.config['PLANNER_MAX_STOPS_PER_VEHICLE'] = 30
+app.config['PLANNER_MAX_ROUTE_HOURS'] = 8
+app.config['PLANNER_SERVICE_MINUTES'] = 10  # unloading time per stop
+app.config['PLANNER_AVERAGE_SPEED_KMH'] = 40
+app.config['PLANNER_WORKERS'] = os.cpu_count() or 2
+app.config['EXPORT_CHUNK_SIZE'] = 1000  # rows fetched per round trip
+app.config['EXPORT_WIDTH_SAMPLE_ROWS'] = 200
+app.config['REPORT_JOB_WORKERS'] = 2
+app.config['REPORT_JOB_RETENTION_HOURS'] = 24
+app.config['REPORT_JOB_PROGRESS_ROWS'] = 5000  # rows between progress writes
+app.config['REPORTS_PAGE_SIZE'] = 50
+app.config['ATTENDANCE_PAGE_SIZE'] = 50
+app.config['LEARNER_RECORDS_PAGE_SIZE'] = 50
+app.config['LEARNER_BATCH_MAX_ROWS'] = 2000
+app.config['SLOW_QUERY_THRESHOLD_MS'] = 200
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')  # bearer token for /metrics scrapers
+app.config['EVENT_LOG_PATH'] = os.path.join(app.instance_path, 'logs', 'events.jsonl')
+app.config['EVENT_LOG_LEVEL'] = os.environ.get('EVENT_LOG_LEVEL', 'INFO')
+app.config['EVENT_LOG_MAX_BYTES'] = 10 * 1024 * 1024
+app.config['EVENT_LOG_BACKUP_COUNT'] = 5
+app.config['DELIVERY_PDF_CACHE_DIR'] = os.path.join(app.instance_path, 'pdf_cache')
+app.config['DELIVERY_PDF_CACHE_MAX_BYTES'] = 50 * 1024 * 1024
+app.config['PDF_RENDER_WORKERS'] = min(4, os.cpu_count() or 2)
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')  # werkzeug method string
+app.config['PASSWORD_HASH_WORKERS'] = 4  # hashes allowed to run at once
+app.config['PASSWORD_HASH_QUEUE'] = 32  # logins allowed to wait for a hashing slot
+app.config['PASSWORD_HASH_WAIT_SECONDS'] = 5
+app.config['LOGIN_THROTTLE_ATTEMPTS'] = 5  # failed logins per email before throttling
+app.config['LOGIN_THROTTLE_WINDOW'] = 300  # seconds
+app.config['LOGIN_THROTTLE_MAX_TRACKED'] = 10000
+app.config['DELIVERY_SYNC_MAX_ITEMS'] = 100  # queued driver updates accepted per sync request
+
+# Database engine profiles
+# DATABASE_PROFILE picks how the engine is tuned: 'sqlite' for the local file
+# or 'postgresql' for a server. It defaults to whatever DATABASE_URL points at.
+app.config['DATABASE_PROFILE'] = os.environ.get('DATABASE_PROFILE') or \
+    ('postgresql' if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql') else 'sqlite')
+app.config['DATABASE_POOL_SIZE'] = int(os.environ.get('DATABASE_POOL_SIZE', 10))
+app.config['DATABASE_MAX_OVERFLOW'] = int(os.environ.get('DATABASE_MAX_OVERFLOW', 20))
+app.config['SQLITE_PRAGMAS'] = {
+    'journal_mode': 'WAL',  # readers no longer wait for writers
+    'synchronous': 'NORMAL',  # safe with WAL, far fewer fsyncs
+    'busy_timeout': 5000,  # ms a writer waits for the lock before "database is locked"
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # negative means KiB, so 64 MiB per connection
+}
+
+def database_engine_options(profile, uri):
+    """SQLAlchemy engine options for an engine profile"""
+    if profile == 'postgresql':
+        return {
+            'pool_size': app.config['DATABASE_POOL_SIZE'],
+            'max_overflow': app.config['DATABASE_MAX_OVERFLOW'],
+            'pool_timeout': 30,
+            'pool_recycle': 1800,  # stay under server and proxy idle timeouts
+            'pool_pre_ping': True,  # replace connections the server dropped
+        }
+    if profile != 'sqlite':
+        raise ValueError(f"Unknown DATABASE_PROFILE {profile!r}; use 'sqlite' or 'postgresql'")
+    if uri in ('sqlite://', 'sqlite:///:memory:'):
+        return {}  # in-memory databases live on a single static connection
+    # Pragmas are applied per connection, so keep connections around
+    return {'pool_size': app.config['DATABASE_POOL_SIZE'], 'max_overflow': app.config['DATABASE_MAX_OVERFLOW']}
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database_engine_options(
+    app.config['DATABASE_PROFILE'], app.config['SQLALCHEMY_DATABASE_URI']
+)
+
+@event.listens_for(Engine, 'connect')
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if app.config['DATABASE_PROFILE'] != 'sqlite' or not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in app.config['SQLITE_PRAGMAS'].items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+# Reporting reads
+# Report pages read from a separate 'reporting' bind so their long scans never
+# hold up cookers and drivers writing to the live database. On SQLite the bind
+# is a snapshot copied with the online backup API and refreshed once it is
+# older than REPORTING_SNAPSHOT_MAX_AGE; on PostgreSQL it is
+# REPORTING_DATABASE_URL (a read replica), or the primary in read-only mode.
+app.config['REPORTING_SNAPSHOT_PATH'] = os.path.join(app.instance_path, 'reporting.db')
+app.config['REPORTING_SNAPSHOT_MAX_AGE'] = int(os.environ.get('REPORTING_SNAPSHOT_MAX_AGE', 300))  # seconds
+app.config['REPORTING_DATABASE_URL'] = os.environ.get('REPORTING_DATABASE_URL')
+
+def reporting_bind_config(profile, uri):
+    """Engine config for the reporting bind, or None when reports read the primary"""
+    if profile == 'postgresql':
+        url = (app.config['REPORTING_DATABASE_URL'] or uri).replace('postgres://', 'postgresql://', 1)
+        return {'url': url, 'execution_options': {'postgresql_readonly': True},
+                **database_engine_options(profile, url)}
+    if uri in ('sqlite://', 'sqlite:///:memory:'):
+        return None
+    # The snapshot file is only ever replaced whole, never written in place.
+    # Any process may swap it, so every checkout opens whichever file is
+    # current rather than reusing a pooled handle on an older one.
+    return {'url': f"sqlite:///file:{app.config['REPORTING_SNAPSHOT_PATH']}?mode=ro&immutable=1&uri=true",
+            'poolclass': NullPool}
+
+_reporting_bind = reporting_bind_config(app.config['DATABASE_PROFILE'], app.config['SQLALCHEMY_DATABASE_URI'])
+if _reporting_bind is not None:
+    app.config['SQLALCHEMY_BINDS'] = {'reporting': _reporting_bind}
+
+class ReportingSession(BaseSession):
+    """Session that sends SELECTs to the reporting bind after use_reporting_bind()"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and g.get('reporting_reads') and getattr(clause, 'is_select', False):
+            return self._db.engines['reporting']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(app, session_options={'class_': ReportingSession})
+migrate = Migrate(app, db)
+
+# Structured events go to a rotating JSON-lines file off the request thread
+event_log = EventLog('manqinenyathi.events')
+event_log.configure(app.config['EVENT_LOG_PATH'],
+                    level=app.config['EVENT_LOG_LEVEL'],
+                    max_bytes=app.config['EVENT_LOG_MAX_BYTES'],
+                    backup_count=app.config['EVENT_LOG_BACKUP_COUNT'])
 
 
 # Database Models (unchanged)
@@ -34,7 +189,7 @@ class User(db.Model):
     full_name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
     password = db.Column(db.String(255), nullable=False)
-    role = db.Column(db.Enum('admin', 'cooker', 'delivery'), nullable=False)
+    role = db.Column(db.Enum('admin', 'cooker', 'delivery', name='user_role'), nullable=False)
     phone = db.Column(db.String(20))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -44,11 +199,15 @@ class User(db.Model):
     learners = db.relationship('Learner', backref='cooker', foreign_keys='Learner.cooker_id')
 
     def set_password(self, password):
-        self.password = generate_password_hash(password)
+        self.password = generate_password_hash(password, method=app.config['PASSWORD_HASH_METHOD'])
 
     def check_password(self, password):
         return check_password_hash(self.password, password)
 
+    def password_needs_rehash(self):
+        """True when the stored hash was made with other parameters than configured"""
+        return self.password.split('$', 1)[0] != password_hash_scheme()
+
 class School(db.Model):
     __tablename__ = 'schools'
     school_id = db.Column(db.Integer, primary_key=True)
@@ -56,6 +215,8 @@ class School(db.Model):
     location = db.Column(db.String(150), nullable=False)
     contact_person = db.Column(db.String(100), nullable=False)
     contact_number = db.Column(db.String(20), nullable=False)
+    latitude = db.Column(db.Float)  # Geocoded from location on save
+    longitude = db.Column(db.Float)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -71,13 +232,25 @@ class Delivery(db.Model):
     delivery_date = db.Column(db.Date, nullable=False)
     location = db.Column(db.String(150), nullable=False)
     delivery_guy_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
-    status = db.Column(db.Enum('Pending', 'Delivered'), default='Pending')
+    status = db.Column(db.Enum('Pending', 'Delivered', name='delivery_status'), default='Pending')
     delivered_time = db.Column(db.DateTime)
     remarks = db.Column(db.Text)
+    latitude = db.Column(db.Float)  # Geocoded from location on save
+    longitude = db.Column(db.Float)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped by the ORM on every update. It keys the slip cache and doubles as
+    # an optimistic lock: a write based on an outdated row raises StaleDataError
+    version = db.Column(db.Integer, nullable=False, server_default='1')
     
     # Add relationship for cooker
     cooker = db.relationship('User', backref='deliveries_for_cooker', foreign_keys=[cooker_id])
+    
+    __table_args__ = (
+        db.Index('ix_deliveries_guy_date_status', 'delivery_guy_id', 'delivery_date', 'status'),
+        db.Index('ix_deliveries_date_created', 'delivery_date', 'created_at'),
+        db.Index('ix_deliveries_status_date', 'status', 'delivery_date'),
+    )
+    __mapper_args__ = {'version_id_col': version}
 
 class Attendance(db.Model):
     __tablename__ = 'attendance'
@@ -87,44 +260,251 @@ class Attendance(db.Model):
     date = db.Column(db.Date, nullable=False)
     time_in = db.Column(db.DateTime)
     time_out = db.Column(db.DateTime)
+    clock_in_key = db.Column(db.String(64))  # client idempotency keys, so retries can be recognised
+    clock_out_key = db.Column(db.String(64))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('cooker_id', 'date', name='uq_attendance_cooker_date'),
+        db.Index('ix_attendance_date', 'date'),
+    )
 
 class Learner(db.Model):
-    __tablename__ = 'learners'
+    __tablename__ = 'learner_roster'
     learner_id = db.Column(db.Integer, primary_key=True)
     learner_name = db.Column(db.String(100), nullable=False)
     grade = db.Column(db.String(10), nullable=False)
+    # School learner number; blank when unknown. Tells apart classmates who share a name
+    learner_number = db.Column(db.String(20), nullable=False, server_default='')
     cooker_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     school_id = db.Column(db.Integer, db.ForeignKey('schools.school_id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    servings = db.relationship('MealServing', backref='learner')
+    
+    __table_args__ = (
+        db.UniqueConstraint('cooker_id', 'school_id', 'grade', 'learner_name', 'learner_number',
+                            name='uq_learner_roster_identity'),
+        db.Index('ix_learner_roster_school_id', 'school_id'),
+    )
+
+class MealServing(db.Model):
+    __tablename__ = 'meal_servings'
+    serving_id = db.Column(db.Integer, primary_key=True)
+    learner_id = db.Column(db.Integer, db.ForeignKey('learner_roster.learner_id'), nullable=False)
     date_served = db.Column(db.Date, nullable=False)
-    meal_type = db.Column(db.String(20), default='Lunch') 
+    meal_type = db.Column(db.String(20), default='Lunch')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # "Who ate today" is an index-only range scan
+    __table_args__ = (
+        db.Index('ix_meal_servings_date_learner', 'date_served', 'learner_id'),
+        db.Index('ix_meal_servings_learner_date', 'learner_id', 'date_served'),
+    )
+
+class MealsServedDaily(db.Model):
+    __tablename__ = 'meals_served_daily'
+    # Rollup of meal_servings, kept in step by record_meals_served()
+    date_served = db.Column(db.Date, primary_key=True)
+    school_id = db.Column(db.Integer, db.ForeignKey('schools.school_id'), primary_key=True)
+    cooker_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    meal_type = db.Column(db.String(20), primary_key=True)
+    meals = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.Index('ix_meals_served_daily_cooker_date', 'cooker_id', 'date_served'),
+    )
 
 class GroceryItem(db.Model):
     __tablename__ = 'grocery_items'
     item_id = db.Column(db.Integer, primary_key=True)
-    cooker_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    cooker_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False, index=True)
     item_name = db.Column(db.String(100), nullable=False)
     size = db.Column(db.Float, nullable=False)
-    unit = db.Column(db.Enum('kg', 'g', 'litre'), nullable=False)
+    unit = db.Column(db.Enum('kg', 'g', 'litre', name='grocery_unit'), nullable=False)
     quantity_needed = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationship
     cooker = db.relationship('User', backref='grocery_items', foreign_keys=[cooker_id])
 
-# Add this function to your app.py
+class DeliverySyncItem(db.Model):
+    """Driver update applied through the sync API, kept so replays are recognised"""
+    __tablename__ = 'delivery_sync_items'
+    delivery_guy_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    client_id = db.Column(db.String(64), primary_key=True)  # generated on the device
+    delivery_id = db.Column(db.Integer, db.ForeignKey('deliveries.delivery_id'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    recorded_at = db.Column(db.DateTime)  # when the driver made the update on the device
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class GroceryListVersion(db.Model):
+    """Change counter per cooker's grocery list, used to key cached delivery slips"""
+    __tablename__ = 'grocery_list_versions'
+    cooker_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class ReportJob(db.Model):
+    __tablename__ = 'report_jobs'
+    job_id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)
+    params = db.Column(db.Text, nullable=False)  # JSON encoded
+    status = db.Column(db.Enum('Queued', 'Running', 'Done', 'Failed', name='report_job_status'), nullable=False, default='Queued')
+    file_path = db.Column(db.String(255))
+    download_name = db.Column(db.String(150))
+    mimetype = db.Column(db.String(100))
+    error = db.Column(db.Text)
+    requested_by = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    worker_pid = db.Column(db.Integer)  # process whose pool runs the job
+    progress = db.Column(db.Integer, nullable=False, server_default='0')  # percent, while Running
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+# Geocoding - coordinates are resolved once when a record is saved
+def resolve_school_coordinates(school):
+    """Store the gazetteer coordinates for a school's location"""
+    coords = geocode(school.location)
+    school.latitude, school.longitude = coords if coords else (None, None)
+
+def resolve_delivery_coordinates(delivery):
+    """Store coordinates for a delivery address, falling back to its school"""
+    coords = geocode(delivery.location)
+    if coords is None:
+        school = delivery.school or School.query.get(delivery.school_id)
+        if school and school.latitude is not None:
+            coords = (school.latitude, school.longitude)
+    delivery.latitude, delivery.longitude = coords if coords else (None, None)
+
+@app.cli.command('geocode-locations')
+def geocode_locations_command():
+    """Fill in coordinates for schools and deliveries saved without them"""
+    schools = School.query.filter(School.latitude.is_(None)).all()
+    for school in schools:
+        resolve_school_coordinates(school)
+    db.session.flush()
+    
+    deliveries = Delivery.query.filter(Delivery.latitude.is_(None)).all()
+    for delivery in deliveries:
+        resolve_delivery_coordinates(delivery)
+    db.session.commit()
+    
+    unresolved = School.query.filter(School.latitude.is_(None)).count()
+    print(f"Geocoded {len(schools)} schools and {len(deliveries)} deliveries ({unresolved} schools still unknown)")
+
+# Delivery route optimization
+def delivery_coordinates(delivery):
+    """Coordinates of a delivery stop, or None when they are unknown"""
+    if delivery.latitude is not None and delivery.longitude is not None:
+        return (delivery.latitude, delivery.longitude)
+    school = delivery.school
+    if school is not None and school.latitude is not None and school.longitude is not None:
+        return (school.latitude, school.longitude)
+    return None
+
+def route_start_location(completed_deliveries):
+    """Start from the last completed stop we can place, else the depot"""
+    for delivery in reversed(completed_deliveries):
+        coords = delivery_coordinates(delivery)
+        if coords:
+            return coords
+    return app.config['DEPOT_COORDINATES']
+
 def optimize_delivery_route(deliveries, start_location):
     """
-    Basic route optimization - sorts by distance from start location
-    In production, use a proper routing algorithm or service
+    Order deliveries into the shortest route we can find from start_location.
+    Stops without known coordinates keep their order at the end of the route.
     """
-    # This is a simplified version - implement proper routing logic
-    return sorted(deliveries, key=lambda x: calculate_distance(start_location, x.location))
+    located, unlocated, points = [], [], []
+    for delivery in deliveries:
+        coords = delivery_coordinates(delivery)
+        if coords:
+            located.append(delivery)
+            points.append(coords)
+        else:
+            unlocated.append(delivery)
+    
+    order, _ = optimize_route(start_location, points,
+                              time_budget=app.config['ROUTE_SOLVER_TIME_BUDGET'])
+    return [located[i] for i in order] + unlocated
 
 def calculate_distance(location1, location2):
-    # Simplified distance calculation - implement proper haversine formula
-    return 0  # Placeholder
+    """Great-circle distance in km between two (lat, lng) points"""
+    return haversine_distance(location1, location2)
+
+# Password hashing
+# Hashes run on a small bounded pool so a login storm waits for a fixed number
+# of hashing threads (hashlib releases the GIL) instead of every worker
+# burning CPU at once. Logins that cannot get a slot in time are turned away.
+_password_hash_executor = None
+_password_hash_slots = None
+_password_hash_lock = threading.Lock()
+_password_hash_schemes = {}
+_login_failures = {}
+_login_failures_lock = threading.Lock()
+
+class PasswordHashBusy(Exception):
+    """Every hashing slot stayed taken for PASSWORD_HASH_WAIT_SECONDS"""
+
+def password_hash_scheme():
+    """Full method prefix (with default costs filled in) that new hashes get"""
+    method = app.config['PASSWORD_HASH_METHOD']
+    if method not in _password_hash_schemes:
+        _password_hash_schemes[method] = generate_password_hash('', method=method).split('$', 1)[0]
+    return _password_hash_schemes[method]
+
+def get_password_hash_executor():
+    """Hashing thread pool and the semaphore bounding how many logins use it"""
+    global _password_hash_executor, _password_hash_slots
+    with _password_hash_lock:
+        if _password_hash_executor is None:
+            _password_hash_executor = ThreadPoolExecutor(
+                max_workers=app.config['PASSWORD_HASH_WORKERS'],
+                thread_name_prefix='password-hash'
+            )
+            _password_hash_slots = threading.BoundedSemaphore(
+                app.config['PASSWORD_HASH_WORKERS'] + app.config['PASSWORD_HASH_QUEUE']
+            )
+    return _password_hash_executor, _password_hash_slots
+
+def run_password_hash(func, *args):
+    """Run a password hash function on the hashing pool and return its result"""
+    executor, slots = get_password_hash_executor()
+    if not slots.acquire(timeout=app.config['PASSWORD_HASH_WAIT_SECONDS']):
+        raise PasswordHashBusy()
+    try:
+        return executor.submit(func, *args).result()
+    finally:
+        slots.release()
+
+def _recent_login_failures(email, now):
+    failures = _login_failures.get(email)
+    cutoff = now - app.config['LOGIN_THROTTLE_WINDOW']
+    while failures and failures[0] <= cutoff:
+        failures.popleft()
+    return failures
+
+def login_throttled(email):
+    """Whether email has used up its failed attempts for the current window"""
+    with _login_failures_lock:
+        failures = _recent_login_failures(email, time.monotonic())
+        return bool(failures) and len(failures) >= app.config['LOGIN_THROTTLE_ATTEMPTS']
+
+def record_login_failure(email):
+    """Count a failed attempt against email"""
+    now = time.monotonic()
+    with _login_failures_lock:
+        if email not in _login_failures and len(_login_failures) >= app.config['LOGIN_THROTTLE_MAX_TRACKED']:
+            for tracked in list(_login_failures):
+                if not _recent_login_failures(tracked, now):
+                    del _login_failures[tracked]
+            while len(_login_failures) >= app.config['LOGIN_THROTTLE_MAX_TRACKED']:
+                del _login_failures[next(iter(_login_failures))]
+        _login_failures.setdefault(email, deque()).append(now)
+
+def clear_login_failures(email):
+    with _login_failures_lock:
+        _login_failures.pop(email, None)
 
 # Updated Routes with Email Authentication
 @app.route('/', methods=['GET', 'POST'])
@@ -133,16 +513,37 @@ def home():
         email = request.form['email'].strip().lower()
         password = request.form['password'].strip()
         
-        print(f"Login attempt: {email}")  # Debug print
+        # Refuse throttled emails before spending a hash on them
+        if login_throttled(email):
+            event_log.info('login_throttled', email=email)
+            return render_template('home.html', error="Too many failed attempts. Please wait a few minutes and try again."), 429
         
         # Query user by email instead of username
         user = User.query.filter_by(email=email).first()
+        event_log.debug('login_attempt', email=email, user_found=user is not None)
+        
+        try:
+            password_ok = user is not None and run_password_hash(user.check_password, password)
+        except PasswordHashBusy:
+            event_log.warning('login_hash_busy', email=email)
+            return render_template('home.html', error="Too many people are signing in right now. Please try again in a moment."), 503
         
-        if user:
-            print(f"User found: {user.email}, Role: {user.role}")  # Debug print
-            print(f"Password check: {user.check_password(password)}")  # Debug print
+        if password_ok:
+            event_log.info('login_succeeded', user_id=user.user_id, role=user.role)
+            clear_login_failures(email)
+            
+            # Upgrade hashes made with older parameters while the password is at hand
+            if user.password_needs_rehash():
+                try:
+                    user.password = run_password_hash(generate_password_hash, password, app.config['PASSWORD_HASH_METHOD'])
+                    db.session.commit()
+                    event_log.info('password_rehashed', user_id=user.user_id)
+                except PasswordHashBusy:
+                    pass  # try again on a later login
+                except Exception:
+                    db.session.rollback()
+                    event_log.exception('password_rehash_failed', user_id=user.user_id)
             
-        if user and user.check_password(password):
             session['user_id'] = user.user_id
             session['username'] = user.full_name
             session['email'] = user.email
@@ -156,64 +557,252 @@ def home():
             elif user.role == 'delivery':
                 return redirect(url_for('dashboard_delivery'))
         else:
-            print("Invalid credentials")  # Debug print
+            record_login_failure(email)
+            event_log.info('login_failed', email=email)
             return render_template('home.html', error="Invalid email or password")
     
     return render_template('home.html', error=None)
 
-@app.route('/dashboard/admin')
-def dashboard_admin():
-    if session.get('role') != 'admin':
-        return redirect(url_for('home'))
-    
-    today = datetime.now().date()
-    
-    # Real statistics calculations
-    total_schools = School.query.count()
-    total_workers = User.query.filter(User.role.in_(['cooker', 'delivery'])).count()
-    
-    # Calculate learners fed today
-    learners_fed_today = Learner.query.filter_by(date_served=today).count()
+# Dashboard statistics service
+# Models whose writes change the admin dashboard counters
+DASHBOARD_STATS_MODELS = (School, User, Delivery, Attendance, MealServing)
+
+_dashboard_stats_cache = {'stats': None, 'date': None, 'expires': 0.0, 'generation': 0}
+_dashboard_stats_lock = threading.Lock()
+
+def _count_where(column, *criteria):
+    """Scalar COUNT subquery so several counters share one SELECT"""
+    return select(func.count(column)).where(*criteria).scalar_subquery()
+
+def _meals_served_where(*criteria):
+    """Scalar SUM subquery over the meals served rollup"""
+    return select(func.coalesce(func.sum(MealsServedDaily.meals), 0)).where(*criteria).scalar_subquery()
+
+def month_bounds(day):
+    """First day of day's month and first day of the next month"""
+    month_start = day.replace(day=1)
+    return month_start, (month_start + timedelta(days=32)).replace(day=1)
+
+def compute_dashboard_stats(today=None):
+    """Compute the admin dashboard counters in two grouped queries"""
+    today = today or datetime.now().date()
+    month_start, next_month_start = month_bounds(today)
     
-    # Calculate delivery statistics
-    total_deliveries_today = Delivery.query.filter_by(delivery_date=today).count()
-    completed_deliveries_today = Delivery.query.filter_by(
-        delivery_date=today, 
-        status='Delivered'
-    ).count()
+    # Staff head counts per role in a single GROUP BY
+    role_counts = dict(
+        db.session.query(User.role, func.count(User.user_id)).group_by(User.role).all()
+    )
     
-    # Calculate cooker attendance
-    total_cookers = User.query.filter_by(role='cooker').count()
-    cookers_clocked_in = Attendance.query.filter_by(date=today).distinct(Attendance.cooker_id).count()
+    # Remaining counters as scalar subqueries of one statement. Meal figures
+    # come from the daily rollup, and the monthly one uses a date range
+    # rather than extract() so it can use the rollup's primary key.
+    row = db.session.execute(select(
+        _count_where(School.school_id).label('total_schools'),
+        _meals_served_where(MealsServedDaily.date_served == today).label('learners_fed_today'),
+        _count_where(Delivery.delivery_id, Delivery.delivery_date == today).label('total_deliveries_today'),
+        _count_where(
+            Delivery.delivery_id,
+            Delivery.delivery_date == today,
+            Delivery.status == 'Delivered'
+        ).label('completed_deliveries_today'),
+        _count_where(Attendance.cooker_id.distinct(), Attendance.date == today).label('cookers_clocked_in'),
+        _meals_served_where(
+            MealsServedDaily.date_served >= month_start,
+            MealsServedDaily.date_served < next_month_start
+        ).label('monthly_learners'),
+        _count_where(Delivery.delivery_id, Delivery.status == 'Pending').label('pending_deliveries')
+    )).one()
+    
+    stats = dict(row._mapping)
+    stats['total_cookers'] = role_counts.get('cooker', 0)
+    stats['active_delivery_guys'] = role_counts.get('delivery', 0)
+    stats['total_workers'] = stats['total_cookers'] + stats['active_delivery_guys']
+    return stats
+
+def get_dashboard_stats():
+    """Return the dashboard counters, served from a short-TTL cache"""
+    today = datetime.now().date()
+    with _dashboard_stats_lock:
+        cache = _dashboard_stats_cache
+        if cache['stats'] is not None and cache['date'] == today and cache['expires'] > time.monotonic():
+            return dict(cache['stats'])
+        generation = cache['generation']
+    
+    stats = compute_dashboard_stats(today)
+    
+    with _dashboard_stats_lock:
+        # Skip storing if a write invalidated the cache while we were computing
+        if _dashboard_stats_cache['generation'] == generation:
+            _dashboard_stats_cache.update(
+                stats=stats,
+                date=today,
+                expires=time.monotonic() + app.config['DASHBOARD_STATS_TTL']
+            )
+    return dict(stats)
+
+def invalidate_dashboard_stats():
+    """Drop the cached dashboard counters"""
+    with _dashboard_stats_lock:
+        _dashboard_stats_cache['stats'] = None
+        _dashboard_stats_cache['generation'] += 1
+
+@event.listens_for(db.session, 'after_flush')
+def _track_dashboard_writes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, DASHBOARD_STATS_MODELS):
+            session.info['dashboard_stats_dirty'] = True
+            return
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _track_dashboard_bulk_writes(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, DASHBOARD_STATS_MODELS):
+        orm_execute_state.session.info['dashboard_stats_dirty'] = True
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_dashboard_on_commit(session):
+    if session.info.pop('dashboard_stats_dirty', False):
+        invalidate_dashboard_stats()
+
+@event.listens_for(db.session, 'after_rollback')
+def _reset_dashboard_tracking(session):
+    session.info.pop('dashboard_stats_dirty', None)
+
+# Live dashboard event stream
+# Each open stream owns a bounded queue; publishers never block on slow clients
+_stream_subscribers = {}
+_stream_lock = threading.Lock()
+_last_broadcast_stats = {}
+
+def subscribe_stream(channel):
+    """Register a new listener queue for a stream channel"""
+    listener = queue.Queue(maxsize=100)
+    with _stream_lock:
+        _stream_subscribers.setdefault(channel, set()).add(listener)
+    return listener
+
+def unsubscribe_stream(channel, listener):
+    """Remove a listener queue once its client disconnects"""
+    with _stream_lock:
+        listeners = _stream_subscribers.get(channel)
+        if listeners is not None:
+            listeners.discard(listener)
+            if not listeners:
+                del _stream_subscribers[channel]
+
+def publish_stream_event(channel, event, data):
+    """Push an event to every listener on a channel"""
+    with _stream_lock:
+        listeners = list(_stream_subscribers.get(channel, ()))
+    for listener in listeners:
+        try:
+            listener.put_nowait((event, data))
+        except queue.Full:
+            # Client is not reading; drop it and let EventSource reconnect
+            unsubscribe_stream(channel, listener)
+
+def broadcast_dashboard_update():
+    """Send only the dashboard counters that changed since the last broadcast"""
+    with _stream_lock:
+        if not _stream_subscribers.get('dashboard'):
+            return
+    # Callers broadcast right after their commit, so a failure here must not
+    # reach their error handling and report a saved change as failed
+    try:
+        stats = get_dashboard_stats()
+    except Exception:
+        event_log.exception('dashboard_broadcast_failed')
+        return
+    with _stream_lock:
+        changed = {key: value for key, value in stats.items() if _last_broadcast_stats.get(key) != value}
+        _last_broadcast_stats.update(stats)
+    if changed:
+        publish_stream_event('dashboard', 'counters', changed)
+
+def poll_dashboard_changes(sent):
+    """Return the cached counters that differ from what a listener last received"""
+    try:
+        stats = get_dashboard_stats()
+    except Exception:
+        event_log.exception('dashboard_stream_poll_failed')
+        return {}
+    finally:
+        # Don't hold a read transaction open for the life of the stream
+        db.session.remove()
+    changed = {key: value for key, value in stats.items() if sent.get(key) != value}
+    sent.update(changed)
+    return changed
+
+def format_sse(event, data):
+    """Encode a single server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Each open stream holds one server worker thread for as long as the tab stays
+# open, so deploy behind a threaded or async server (gthread, gevent, eventlet)
+# rather than a small pool of sync workers.
+# Broadcasts only reach listeners in the process that handled the write; admin
+# streams also re-read the cached counters on every keepalive so changes made
+# through other worker processes still arrive within a keepalive plus the TTL.
+@app.route('/stream/dashboard')
+def stream_dashboard():
+    role = session.get('role')
+    if role == 'admin':
+        channel = 'dashboard'
+        initial = ('counters', get_dashboard_stats())
+        db.session.remove()
+    elif role == 'cooker':
+        # Cookers only hear about their own attendance changes
+        channel = f"cooker:{session.get('user_id')}"
+        initial = None
+    else:
+        return Response(status=403)
     
-    # Calculate monthly learners
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    monthly_learners = Learner.query.filter(
-        db.extract('month', Learner.date_served) == current_month,
-        db.extract('year', Learner.date_served) == current_year
-    ).count()
+    listener = subscribe_stream(channel)
+    keepalive = app.config['STREAM_KEEPALIVE_SECONDS']
     
-    # Active delivery personnel
-    active_delivery_guys = User.query.filter_by(role='delivery').count()
+    def generate():
+        # Counters this listener has already been sent
+        sent = dict(initial[1]) if initial else {}
+        try:
+            if initial:
+                yield format_sse(*initial)
+            while True:
+                try:
+                    event, data = listener.get(timeout=keepalive)
+                except queue.Empty:
+                    changed = poll_dashboard_changes(sent) if channel == 'dashboard' else None
+                    yield format_sse('counters', changed) if changed else ": keepalive\n\n"
+                    continue
+                if event == 'counters':
+                    sent.update(data)
+                yield format_sse(event, data)
+        finally:
+            unsubscribe_stream(channel, listener)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/dashboard/admin')
+def dashboard_admin():
+    if session.get('role') != 'admin':
+        return redirect(url_for('home'))
     
-    # Pending deliveries
-    pending_deliveries = Delivery.query.filter_by(status='Pending').count()
+    # Counters come from the cached stats service
+    stats = get_dashboard_stats()
     
-    recent_deliveries = Delivery.query.order_by(Delivery.delivery_date.desc()).limit(5).all()
+    recent_deliveries = Delivery.query\
+        .options(selectinload(Delivery.school), selectinload(Delivery.delivery_guy))\
+        .order_by(Delivery.delivery_date.desc())\
+        .limit(5)\
+        .all()
     
     return render_template('dashboard_admin.html', 
-                         total_schools=total_schools,
-                         total_workers=total_workers,
-                         learners_fed_today=learners_fed_today,
-                         total_deliveries_today=total_deliveries_today,
-                         completed_deliveries_today=completed_deliveries_today,
-                         cookers_clocked_in=cookers_clocked_in,
-                         total_cookers=total_cookers,
-                         monthly_learners=monthly_learners,
-                         active_delivery_guys=active_delivery_guys,
-                         pending_deliveries=pending_deliveries,
-                         recent_deliveries=recent_deliveries)
+                         recent_deliveries=recent_deliveries,
+                         **stats)
 
 # Add notification system
 @app.route('/admin/send-notification', methods=['POST'])
@@ -232,7 +821,8 @@ def send_notification():
         # 2. Use WebSockets for real-time delivery
         # 3. Integrate with email/SMS services
         
-        print(f"📢 Notification Sent: {message} | Type: {notification_type} | Target: {target_role}")
+        event_log.info('notification_sent', message=message, type=notification_type,
+                       target_role=target_role, user_id=session.get('user_id'))
         
         # For now, we'll just return success
         return jsonify({
@@ -244,19 +834,9 @@ def send_notification():
         return jsonify({'success': False, 'message': str(e)})
 
 # Add system logging
-import logging
-from datetime import datetime
-
 def log_system_event(event_type, description, user_id=None):
     """Log system events for monitoring"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    user_info = f"User {user_id}" if user_id else "System"
-    log_message = f"[{timestamp}] {user_info} - {event_type}: {description}"
-    
-    print(f"📊 SYSTEM LOG: {log_message}")
-    
-    # In production, you would write to a log file or database
-    logging.info(log_message)
+    event_log.info(event_type, description=description, user_id=user_id)
 
 @app.route('/dashboard/cooker')
 def dashboard_cooker():
@@ -267,15 +847,15 @@ def dashboard_cooker():
     today = datetime.now().date()
     current_month = datetime.now().month
     current_year = datetime.now().year
+    month_start, next_month_start = month_bounds(today)
     
     # Get assigned school for the cooker
     assigned_school = School.query.first()  # Modify this based on your assignment logic
     
-    # Get today's learners count
-    learners_fed_today = Learner.query.filter_by(
-        cooker_id=user_id, 
-        date_served=today
-    ).count()
+    # Get today's learners count from the rollup
+    learners_fed_today = db.session.execute(
+        select(_meals_served_where(MealsServedDaily.cooker_id == user_id, MealsServedDaily.date_served == today))
+    ).scalar()
     
     # Get today's attendance record
     today_attendance = Attendance.query.filter_by(
@@ -292,8 +872,8 @@ def dashboard_cooker():
     # Calculate days worked this month
     days_worked_this_month = Attendance.query.filter(
         Attendance.cooker_id == user_id,
-        db.extract('month', Attendance.date) == current_month,
-        db.extract('year', Attendance.date) == current_year,
+        Attendance.date >= month_start,
+        Attendance.date < next_month_start,
         Attendance.time_in.isnot(None)
     ).count()
     
@@ -343,6 +923,7 @@ def add_school():
             contact_person=contact_person,
             contact_number=contact_number
         )
+        resolve_school_coordinates(new_school)
         
         try:
             db.session.add(new_school)
@@ -367,6 +948,7 @@ def edit_school(school_id):
         school.location = request.form['location']
         school.contact_person = request.form['contact_person']
         school.contact_number = request.form['contact_number']
+        resolve_school_coordinates(school)
         
         try:
             db.session.commit()
@@ -519,8 +1101,16 @@ def manage_deliveries():
     if session.get('role') != 'admin':
         return redirect(url_for('home'))
     
-    deliveries = Delivery.query.order_by(Delivery.delivery_date.desc()).all()
-    return render_template('manage_deliveries.html', deliveries=deliveries)
+    # Schools and drivers arrive in one IN query each instead of one per row
+    deliveries = Delivery.query\
+        .options(selectinload(Delivery.school), selectinload(Delivery.delivery_guy))\
+        .order_by(Delivery.delivery_date.desc())\
+        .all()
+    delivery_guys = User.query.filter_by(role='delivery').order_by(User.full_name).all()
+    return render_template('manage_deliveries.html',
+                         deliveries=deliveries,
+                         delivery_guys=delivery_guys,
+                         today=datetime.now().date())
 
 @app.route('/admin/deliveries/assign', methods=['GET', 'POST'])
 def assign_delivery():
@@ -550,6 +1140,7 @@ def assign_delivery():
             remarks=remarks,
             status='Pending'
         )
+        resolve_delivery_coordinates(new_delivery)
         
         try:
             db.session.add(new_delivery)
@@ -565,6 +1156,117 @@ def assign_delivery():
                          delivery_guys=delivery_guys,
                          cookers=cookers)  # Pass cookers to template
 
+# Fleet delivery planning
+_planner_pool = None
+
+def get_planner_pool():
+    """Process pool shared by fleet planning requests"""
+    global _planner_pool
+    if _planner_pool is None:
+        # Workers come from a clean forkserver rather than forking this
+        # process, whose other threads may be holding locks at that moment
+        _planner_pool = ProcessPoolExecutor(max_workers=app.config['PLANNER_WORKERS'],
+                                            mp_context=multiprocessing.get_context('forkserver'))
+    return _planner_pool
+
+def latest_cooker_by_school():
+    """Map each school to the cooker on its most recent delivery"""
+    latest = db.session.query(func.max(Delivery.delivery_id))\
+        .group_by(Delivery.school_id)\
+        .scalar_subquery()
+    rows = db.session.query(Delivery.school_id, Delivery.cooker_id)\
+        .filter(Delivery.delivery_id.in_(latest))\
+        .all()
+    return dict(rows)
+
+@app.route('/admin/deliveries/plan', methods=['GET', 'POST'])
+def plan_deliveries():
+    if session.get('role') != 'admin':
+        return redirect(url_for('home'))
+    
+    delivery_guys = User.query.filter_by(role='delivery').order_by(User.full_name).all()
+    cookers = User.query.filter_by(role='cooker').order_by(User.full_name).all()
+    
+    if request.method == 'POST':
+        try:
+            delivery_date = datetime.strptime(request.form['delivery_date'], '%Y-%m-%d').date()
+            max_stops = int(request.form.get('max_stops') or app.config['PLANNER_MAX_STOPS_PER_VEHICLE'])
+            max_hours = float(request.form.get('max_hours') or app.config['PLANNER_MAX_ROUTE_HOURS'])
+            driver_ids = {int(driver_id) for driver_id in request.form.getlist('delivery_guy_ids')}
+        except ValueError:
+            flash('Invalid planning parameters.', 'error')
+            return redirect(url_for('plan_deliveries'))
+        
+        drivers = [guy for guy in delivery_guys if guy.user_id in driver_ids]
+        default_cooker_id = request.form.get('default_cooker_id', type=int)
+        
+        if not drivers:
+            flash('Select at least one delivery person.', 'error')
+            return redirect(url_for('plan_deliveries'))
+        
+        # Schools that still need a delivery on this date
+        already_planned = db.session.query(Delivery.school_id).filter(Delivery.delivery_date == delivery_date)
+        schools = School.query.filter(School.school_id.notin_(already_planned)).all()
+        cooker_by_school = latest_cooker_by_school()
+        
+        stops, unplanned = [], []
+        for school in schools:
+            cooker_id = cooker_by_school.get(school.school_id, default_cooker_id)
+            if school.latitude is None or cooker_id is None:
+                unplanned.append(school)
+            else:
+                stops.append((school, cooker_id))
+        
+        routes, unassigned = plan_fleet_routes(
+            app.config['DEPOT_COORDINATES'],
+            [(school.latitude, school.longitude) for school, _ in stops],
+            vehicle_count=len(drivers),
+            max_stops=max_stops,
+            max_minutes=max_hours * 60,
+            service_minutes=app.config['PLANNER_SERVICE_MINUTES'],
+            speed_kmh=app.config['PLANNER_AVERAGE_SPEED_KMH'],
+            time_budget=app.config['ROUTE_SOLVER_TIME_BUDGET'],
+            map_func=get_planner_pool().map
+        )
+        unplanned.extend(stops[i][0] for i in unassigned)
+        
+        # Write every assignment in a single transaction
+        new_deliveries = []
+        for driver, route in zip(drivers, routes):
+            for stop_number, index in enumerate(route['stops'], start=1):
+                school, cooker_id = stops[index]
+                new_deliveries.append(Delivery(
+                    school_id=school.school_id,
+                    cooker_id=cooker_id,
+                    delivery_date=delivery_date,
+                    location=school.location,
+                    latitude=school.latitude,
+                    longitude=school.longitude,
+                    delivery_guy_id=driver.user_id,
+                    remarks=f"Planned stop {stop_number} of {len(route['stops'])}",
+                    status='Pending'
+                ))
+        
+        try:
+            db.session.add_all(new_deliveries)
+            db.session.commit()
+            broadcast_dashboard_update()
+            flash(f'Planned {len(new_deliveries)} deliveries across {len(routes)} drivers.', 'success')
+            if unplanned:
+                names = ', '.join(school.school_name for school in unplanned)
+                flash(f'Could not plan {len(unplanned)} schools (no coordinates, no cooker or over the limits): {names}', 'error')
+            return redirect(url_for('manage_deliveries'))
+        except Exception as e:
+            db.session.rollback()
+            flash('Error saving the delivery plan. Please try again.', 'error')
+    
+    return render_template('plan_deliveries.html',
+                         delivery_guys=delivery_guys,
+                         cookers=cookers,
+                         max_stops=app.config['PLANNER_MAX_STOPS_PER_VEHICLE'],
+                         max_hours=app.config['PLANNER_MAX_ROUTE_HOURS'],
+                         today=datetime.now().date())
+
 @app.route('/admin/deliveries/edit/<int:delivery_id>', methods=['GET', 'POST'])
 def edit_delivery(delivery_id):
     if session.get('role') != 'admin':
@@ -576,22 +1278,29 @@ def edit_delivery(delivery_id):
     cookers = User.query.filter_by(role='cooker').order_by(User.full_name).all()  # New
     
     if request.method == 'POST':
-        delivery.school_id = request.form['school_id']
-        delivery.cooker_id = request.form['cooker_id']  # New field
-        delivery.delivery_date = datetime.strptime(request.form['delivery_date'], '%Y-%m-%d').date()
-        delivery.location = request.form['location']
-        delivery.delivery_guy_id = request.form['delivery_guy_id']
-        delivery.remarks = request.form.get('remarks', '')
-        delivery.status = request.form['status']
-        
-        # If marked as delivered, set delivered time
-        if delivery.status == 'Delivered' and not delivery.delivered_time:
-            delivery.delivered_time = datetime.utcnow()
-        
         try:
+            delivery.school_id = request.form['school_id']
+            delivery.cooker_id = request.form['cooker_id']  # New field
+            delivery.delivery_date = datetime.strptime(request.form['delivery_date'], '%Y-%m-%d').date()
+            delivery.location = request.form['location']
+            delivery.delivery_guy_id = request.form['delivery_guy_id']
+            delivery.remarks = request.form.get('remarks', '')
+            delivery.status = request.form['status']
+            # Looking up the school can autoflush, so a conflict may surface here
+            resolve_delivery_coordinates(delivery)
+            
+            # If marked as delivered, set delivered time
+            if delivery.status == 'Delivered' and not delivery.delivered_time:
+                delivery.delivered_time = datetime.utcnow()
+            
             db.session.commit()
             flash('Delivery updated successfully!', 'success')
             return redirect(url_for('manage_deliveries'))
+        except StaleDataError:
+            db.session.rollback()
+            flash('This delivery was changed while you were saving, for example by its driver. '
+                  'Please check the latest details and save again.', 'error')
+            return redirect(url_for('edit_delivery', delivery_id=delivery_id))
         except Exception as e:
             db.session.rollback()
             flash('Error updating delivery. Please try again.', 'error')
@@ -610,9 +1319,13 @@ def delete_delivery(delivery_id):
     delivery = Delivery.query.get_or_404(delivery_id)
     
     try:
+        DeliverySyncItem.query.filter_by(delivery_id=delivery_id).delete()
         db.session.delete(delivery)
         db.session.commit()
         flash('Delivery assignment deleted successfully!', 'success')
+    except StaleDataError:
+        db.session.rollback()
+        flash('This delivery was changed while you were deleting it. Please check it and try again.', 'error')
     except Exception as e:
         db.session.rollback()
         flash('Error deleting delivery assignment. Please try again.', 'error')
@@ -630,7 +1343,11 @@ def mark_delivery_delivered(delivery_id):
         delivery.status = 'Delivered'
         delivery.delivered_time = datetime.utcnow()
         db.session.commit()
+        broadcast_dashboard_update()
         flash('Delivery marked as delivered!', 'success')
+    except StaleDataError:
+        db.session.rollback()
+        flash('This delivery was updated by someone else at the same time. Please check its status.', 'error')
     except Exception as e:
         db.session.rollback()
         flash('Error updating delivery status. Please try again.', 'error')
@@ -659,13 +1376,12 @@ def cooker_attendance():
     ).order_by(Attendance.date.desc()).limit(30).all()
     
     # Calculate monthly stats
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+    month_start, next_month_start = month_bounds(today)
     
     monthly_attendance = Attendance.query.filter(
         Attendance.cooker_id == user_id,
-        db.extract('month', Attendance.date) == current_month,
-        db.extract('year', Attendance.date) == current_year
+        Attendance.date >= month_start,
+        Attendance.date < next_month_start
     ).all()
     
     days_worked = len(monthly_attendance)
@@ -682,6 +1398,16 @@ def cooker_attendance():
                          total_hours=total_hours,
                          today=today)
 
+def request_idempotency_key():
+    """Client-supplied idempotency key from the header or the submitted form"""
+    key = (request.headers.get('Idempotency-Key') or request.form.get('idempotency_key') or '').strip()
+    return key[:64] or None
+
+@app.template_global()
+def new_idempotency_key():
+    """Fresh key for a form whose submission should take effect once"""
+    return uuid.uuid4().hex
+
 @app.route('/cooker/attendance/clock_in', methods=['POST'])
 def clock_in():
     if session.get('role') != 'cooker':
@@ -689,32 +1415,39 @@ def clock_in():
     
     user_id = session.get('user_id')
     today = datetime.now().date()
-    
-    # Check if already clocked in today
-    existing_attendance = Attendance.query.filter_by(
-        cooker_id=user_id, 
-        date=today
-    ).first()
-    
-    if existing_attendance:
-        flash('You have already clocked in today!', 'error')
-        return redirect(url_for('cooker_attendance'))
+    idempotency_key = request_idempotency_key()
     
     # Get assigned school for the cooker
     # You might need to modify this based on your school assignment logic
-    assigned_school = School.query.first()  # Default to first school for now
+    assigned_school = select(School.school_id).order_by(School.school_id).limit(1).scalar_subquery()
     
-    new_attendance = Attendance(
+    # One statement: the unique (cooker_id, date) constraint turns a repeat
+    # clock-in into a no-op instead of a second row
+    stmt = upsert_insert(Attendance).values(
         cooker_id=user_id,
-        school_id=assigned_school.school_id if assigned_school else 1,
+        school_id=func.coalesce(assigned_school, 1),  # Default to first school for now
         date=today,
         time_in=datetime.now(),
-        time_out=None
-    )
+        time_out=None,
+        clock_in_key=idempotency_key
+    ).on_conflict_do_nothing(index_elements=['cooker_id', 'date'])
     
     try:
-        db.session.add(new_attendance)
+        clocked_in = db.session.execute(stmt).rowcount == 1
+        if not clocked_in and idempotency_key:
+            # A retry of the request that did clock in reports the same success
+            clocked_in = db.session.query(Attendance.clock_in_key)\
+                .filter_by(cooker_id=user_id, date=today)\
+                .scalar() == idempotency_key
+            if clocked_in:
+                flash('Successfully clocked in!', 'success')
+                return redirect(url_for('cooker_attendance'))
+        if not clocked_in:
+            flash('You have already clocked in today!', 'error')
+            return redirect(url_for('cooker_attendance'))
         db.session.commit()
+        publish_stream_event(f"cooker:{user_id}", 'attendance', {'status': 'clocked_in'})
+        broadcast_dashboard_update()
         flash('Successfully clocked in!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -729,24 +1462,28 @@ def clock_out():
     
     user_id = session.get('user_id')
     today = datetime.now().date()
+    idempotency_key = request_idempotency_key()
     
-    # Get today's attendance record
-    attendance = Attendance.query.filter_by(
-        cooker_id=user_id, 
-        date=today
-    ).first()
-    
-    if not attendance:
-        flash('You need to clock in first!', 'error')
-        return redirect(url_for('cooker_attendance'))
-    
-    if attendance.time_out:
-        flash('You have already clocked out today!', 'error')
-        return redirect(url_for('cooker_attendance'))
+    # One conditional UPDATE; only an open attendance row can be closed
+    stmt = update(Attendance)\
+        .where(Attendance.cooker_id == user_id, Attendance.date == today, Attendance.time_out.is_(None))\
+        .values(time_out=datetime.now(), clock_out_key=idempotency_key)\
+        .execution_options(synchronize_session=False)
     
     try:
-        attendance.time_out = datetime.now()
+        if db.session.execute(stmt).rowcount != 1:
+            # Nothing to close: find out why, which costs a query only here
+            attendance = Attendance.query.filter_by(cooker_id=user_id, date=today).first()
+            if not attendance:
+                flash('You need to clock in first!', 'error')
+            elif idempotency_key and attendance.clock_out_key == idempotency_key:
+                flash('Successfully clocked out!', 'success')
+            else:
+                flash('You have already clocked out today!', 'error')
+            return redirect(url_for('cooker_attendance'))
         db.session.commit()
+        publish_stream_event(f"cooker:{user_id}", 'attendance', {'status': 'clocked_out'})
+        broadcast_dashboard_update()
         flash('Successfully clocked out!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -761,10 +1498,15 @@ def add_learner():
         return redirect(url_for('home'))
     
     if request.method == 'POST':
-        learner_name = request.form['learner_name']
-        grade = request.form['grade']
+        learner_name = request.form['learner_name'].strip()
+        grade = request.form['grade'].strip()
+        learner_number = request.form.get('learner_number', '').strip()
         meal_type = request.form['meal_type']
         
+        if len(learner_number) > 20:
+            flash('Learner number must be at most 20 characters.', 'error')
+            return redirect(url_for('cooker_learners_records'))
+        
         # Get current user and their assigned school
         user_id = session.get('user_id')
         today = datetime.now().date()
@@ -772,19 +1514,20 @@ def add_learner():
         # Get the cooker's assigned school (you may need to modify this logic)
         assigned_school = School.query.first()  # Default to first school for now
         
-        # Create new learner record
-        new_learner = Learner(
-            learner_name=learner_name,
-            grade=grade,
-            cooker_id=user_id,
-            school_id=assigned_school.school_id if assigned_school else 1,
-            date_served=today,
-            meal_type=meal_type
-        )
+        school_id = assigned_school.school_id if assigned_school else 1
         
         try:
-            db.session.add(new_learner)
+            # Enrol the learner on first sight, then record the meal
+            learner_key = (learner_name, grade, learner_number)
+            learner_ids = roster_learner_ids(user_id, school_id, [learner_key])
+            db.session.add(MealServing(
+                learner_id=learner_ids[learner_key],
+                date_served=today,
+                meal_type=meal_type
+            ))
+            record_meals_served({(today, school_id, user_id, meal_type): 1})
             db.session.commit()
+            broadcast_dashboard_update()
             flash('Learner record added successfully!', 'success')
         except Exception as e:
             db.session.rollback()
@@ -792,6 +1535,355 @@ def add_learner():
     
     return redirect(url_for('cooker_learners_records'))
 
+# Learner roster
+# Learners are enrolled once per cooker and school; each meal served is a
+# small MealServing row pointing back at the roster. A learner is identified
+# by name and grade plus the school's learner number when one is given, so
+# classmates who share a name stay separate learners.
+def roster_learner_ids(cooker_id, school_id, people):
+    """Map (learner_name, grade, learner_number) keys to roster ids, enrolling new learners"""
+    wanted = set(people)
+    names = {name for name, grade, number in wanted}
+    
+    def lookup():
+        rows = db.session.execute(
+            select(Learner.learner_name, Learner.grade, Learner.learner_number, Learner.learner_id)
+            .where(Learner.cooker_id == cooker_id,
+                   Learner.school_id == school_id,
+                   Learner.learner_name.in_(names))
+        ).all()
+        return {(name, grade, number): learner_id for name, grade, number, learner_id in rows}
+    
+    learner_ids = lookup()
+    missing = wanted - learner_ids.keys()
+    if missing:
+        # A concurrent capture may enrol the same child first; the unique
+        # roster identity turns our insert into a no-op and the re-select
+        # picks up their row
+        now = datetime.utcnow()
+        stmt = upsert_insert(Learner).on_conflict_do_nothing(
+            index_elements=['cooker_id', 'school_id', 'grade', 'learner_name', 'learner_number']
+        )
+        db.session.execute(stmt, [
+            {'learner_name': name, 'grade': grade, 'learner_number': number,
+             'cooker_id': cooker_id, 'school_id': school_id, 'created_at': now}
+            for name, grade, number in sorted(missing)
+        ])
+        learner_ids = lookup()
+    return learner_ids
+
+# Meals served rollup
+# meals_served_daily holds one counter per date, school, cooker and meal
+# type. Every write to meal_servings adjusts it in the same transaction, so
+# dashboards and monthly figures sum a handful of rows.
+def upsert_insert(model):
+    """INSERT for model in the session dialect, so it can take ON CONFLICT"""
+    upsert = postgresql.insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+    return upsert(model)
+
+def record_meals_served(deltas):
+    """Add {(date_served, school_id, cooker_id, meal_type): change} to the rollup"""
+    rows = [
+        {'date_served': date_served, 'school_id': school_id, 'cooker_id': cooker_id,
+         'meal_type': meal_type or 'Lunch', 'meals': change}
+        for (date_served, school_id, cooker_id, meal_type), change in sorted(deltas.items())
+        if change
+    ]
+    if not rows:
+        return
+    
+    stmt = upsert_insert(MealsServedDaily).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['date_served', 'school_id', 'cooker_id', 'meal_type'],
+        set_={'meals': MealsServedDaily.meals + stmt.excluded.meals}
+    )
+    db.session.execute(stmt)
+    # Drop counters that fell to zero, touching only the keys just changed
+    emptied = [
+        (row['date_served'], row['school_id'], row['cooker_id'], row['meal_type'])
+        for row in rows if row['meals'] < 0
+    ]
+    if emptied:
+        key = tuple_(MealsServedDaily.date_served, MealsServedDaily.school_id,
+                     MealsServedDaily.cooker_id, MealsServedDaily.meal_type)
+        db.session.execute(delete(MealsServedDaily).where(key.in_(emptied), MealsServedDaily.meals <= 0))
+
+def rebuild_meals_served_rollup():
+    """Recompute the whole rollup from meal_servings in one transaction"""
+    meal_type = func.coalesce(MealServing.meal_type, 'Lunch')
+    totals = select(MealServing.date_served, Learner.school_id, Learner.cooker_id, meal_type, func.count())\
+        .join(Learner, MealServing.learner_id == Learner.learner_id)\
+        .group_by(MealServing.date_served, Learner.school_id, Learner.cooker_id, meal_type)
+    
+    db.session.execute(delete(MealsServedDaily))
+    db.session.execute(insert(MealsServedDaily).from_select(
+        ['date_served', 'school_id', 'cooker_id', 'meal_type', 'meals'], totals
+    ))
+    db.session.commit()
+    invalidate_dashboard_stats()
+    return MealsServedDaily.query.count()
+
+@app.cli.command('rebuild-meals-rollup')
+def rebuild_meals_rollup_command():
+    """Rebuild the meals served rollup from the meal servings table"""
+    print(f"Rebuilt meals served rollup with {rebuild_meals_served_rollup()} rows")
+
+# Reporting snapshot
+# The backup is written to a temporary file and swapped in whole, so reports
+# still reading the previous snapshot finish undisturbed. Requests serve the
+# snapshot they find and start a background refresh once it is stale. Until
+# there is a snapshot matching the current migration, reports read the
+# primary while a background refresh takes one, so no request waits on a copy.
+_reporting_snapshot_lock = threading.Lock()
+_reporting_snapshot_refreshing = threading.Event()
+_reporting_snapshot_start_lock = threading.Lock()
+
+@app.template_global()
+def reporting_uses_snapshot():
+    """Whether reports read a snapshot file rather than a database server"""
+    return 'reporting' in db.engines and app.config['DATABASE_PROFILE'] == 'sqlite'
+
+def reporting_snapshot_time():
+    """When the current snapshot was taken, or None if there is none yet"""
+    try:
+        return datetime.fromtimestamp(os.path.getmtime(app.config['REPORTING_SNAPSHOT_PATH']))
+    except OSError:
+        return None
+
+def refresh_reporting_snapshot():
+    """Copy the live database into the reporting snapshot and return its time"""
+    path = app.config['REPORTING_SNAPSHOT_PATH']
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    started = time.perf_counter()
+    with _reporting_snapshot_lock:
+        taken = time.time()
+        target = sqlite3.connect(temp_path)
+        try:
+            source = db.engine.raw_connection()
+            try:
+                # A single backup step copies every page in one read transaction
+                source.driver_connection.backup(target)
+            finally:
+                source.close()
+            # Readers open the snapshot immutable, so it must not rely on a WAL
+            target.execute('PRAGMA journal_mode=DELETE')
+            target.close()
+            os.utime(temp_path, (taken, taken))
+            os.replace(temp_path, path)
+        except Exception:
+            target.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    event_log.info('reporting_snapshot_refreshed', bytes=os.path.getsize(path),
+                   ms=round((time.perf_counter() - started) * 1000, 1))
+    return datetime.fromtimestamp(taken)
+
+def _refresh_reporting_snapshot_in_background():
+    with app.app_context():
+        try:
+            refresh_reporting_snapshot()
+        except Exception:
+            event_log.exception('reporting_snapshot_failed')
+        finally:
+            _reporting_snapshot_refreshing.clear()
+
+def start_reporting_snapshot_refresh():
+    """Refresh the snapshot on a background thread unless one is already running"""
+    with _reporting_snapshot_start_lock:
+        if _reporting_snapshot_refreshing.is_set():
+            return
+        _reporting_snapshot_refreshing.set()
+    threading.Thread(target=_refresh_reporting_snapshot_in_background,
+                     name='reporting-snapshot', daemon=True).start()
+
+def alembic_revision(engine):
+    """Migration revision of an engine's SQLite database, or None if it has none"""
+    # A raw DBAPI cursor keeps this check out of the per-route SQL counts
+    connection = engine.raw_connection()
+    try:
+        row = connection.cursor().execute('SELECT version_num FROM alembic_version').fetchone()
+    except sqlite3.Error:
+        return None
+    finally:
+        connection.close()
+    return row[0] if row else None
+
+def current_reporting_snapshot():
+    """Time of the snapshot to read, or None while there is no usable one yet"""
+    taken = reporting_snapshot_time()
+    if taken is None or alembic_revision(db.engines['reporting']) != alembic_revision(db.engine):
+        # Nothing to read yet, or a copy whose schema no longer matches the
+        # models; the caller reads the primary until the new copy lands
+        start_reporting_snapshot_refresh()
+        return None
+    if (datetime.now() - taken).total_seconds() > app.config['REPORTING_SNAPSHOT_MAX_AGE']:
+        start_reporting_snapshot_refresh()
+    return taken
+
+def replica_data_as_of():
+    """How current the PostgreSQL reporting bind is"""
+    if not app.config['REPORTING_DATABASE_URL']:
+        return datetime.now()  # read-only transactions on the primary see live data
+    # A caught-up replica is current even when nothing was committed lately
+    with db.engines['reporting'].connect() as connection:
+        replayed = connection.execute(text(
+            'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+            'THEN NULL ELSE pg_last_xact_replay_timestamp() END'
+        )).scalar()
+    return replayed.astimezone().replace(tzinfo=None) if replayed else datetime.now()
+
+def use_reporting_bind():
+    """Send this context's remaining SELECTs to the reporting bind; returns when its data is from"""
+    if 'reporting' not in db.engines:
+        return datetime.now()
+    if reporting_uses_snapshot():
+        data_as_of = current_reporting_snapshot()
+        if data_as_of is None:
+            return datetime.now()
+    else:
+        data_as_of = replica_data_as_of()
+    g.reporting_reads = True
+    return data_as_of
+
+@app.cli.command('refresh-reporting-snapshot')
+def refresh_reporting_snapshot_command():
+    """Copy the live database into the reporting snapshot"""
+    if not reporting_uses_snapshot():
+        print("Reports read from the database server; there is no snapshot to refresh")
+        return
+    print(f"Reporting snapshot taken at {refresh_reporting_snapshot():%Y-%m-%d %H:%M:%S}")
+
+# Bulk learner capture
+# A whole class list is validated up front and written with one executemany
+# in a single transaction, so a busy lunch service costs one commit.
+LEARNER_MEAL_TYPES = ('Breakfast', 'Lunch', 'Both')
+
+def parse_learner_batch(rows, default_meal_type):
+    """Validate learner rows, returning (clean rows, per-row errors)"""
+    clean, errors = [], []
+    for line, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({'row': line, 'errors': ['Expected an object with learner_name and grade']})
+            continue
+        learner_name = str(row.get('learner_name') or '').strip()
+        grade = str(row.get('grade') or '').strip()
+        learner_number = str(row.get('learner_number') or '').strip()
+        meal_type = str(row.get('meal_type') or default_meal_type or '').strip()
+        
+        problems = []
+        if not learner_name:
+            problems.append('Learner name is required')
+        elif len(learner_name) > 100:
+            problems.append('Learner name must be at most 100 characters')
+        if not grade:
+            problems.append('Grade is required')
+        elif len(grade) > 10:
+            problems.append('Grade must be at most 10 characters')
+        if len(learner_number) > 20:
+            problems.append('Learner number must be at most 20 characters')
+        if meal_type not in LEARNER_MEAL_TYPES:
+            problems.append(f'Meal type must be one of {", ".join(LEARNER_MEAL_TYPES)}')
+        
+        if problems:
+            errors.append({'row': line, 'learner_name': learner_name, 'errors': problems})
+        else:
+            clean.append({'learner_name': learner_name, 'grade': grade,
+                          'learner_number': learner_number, 'meal_type': meal_type})
+    return clean, errors
+
+def read_learner_csv(text):
+    """Read learner rows from CSV text with an optional header line"""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return []
+    fields = ['learner_name', 'grade', 'meal_type', 'learner_number']
+    first = [cell.strip().lower() for cell in next(csv.reader([lines[0]]))]
+    if 'learner_name' in first or 'grade' in first:
+        fields, lines = first, lines[1:]
+    return [dict(zip(fields, (cell.strip() for cell in cells))) for cells in csv.reader(lines)]
+
+@app.route('/cooker/learners/bulk', methods=['POST'])
+def add_learners_bulk():
+    if session.get('role') != 'cooker':
+        if request.is_json:
+            return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+        return redirect(url_for('home'))
+    
+    # Accept a JSON body, an uploaded CSV file or a pasted CSV list
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        if isinstance(payload, list):
+            payload = {'learners': payload}
+        if not isinstance(payload, dict) or not isinstance(payload.get('learners'), list):
+            return jsonify({'success': False, 'message': 'Expected a JSON list of learners'}), 400
+        rows, default_meal_type = payload['learners'], payload.get('meal_type', 'Lunch')
+    else:
+        upload = request.files.get('learners_file')
+        if upload and upload.filename:
+            text = upload.read().decode('utf-8-sig', errors='replace')
+        else:
+            text = request.form.get('learner_list', '')
+        rows, default_meal_type = read_learner_csv(text), request.form.get('meal_type', 'Lunch')
+    
+    def respond(success, message, status=200, errors=(), inserted=0):
+        if request.is_json:
+            return jsonify({'success': success, 'message': message,
+                            'inserted': inserted, 'errors': list(errors)}), status
+        flash(message, 'success' if success else 'error')
+        for error in list(errors)[:10]:
+            flash(f"Row {error['row']}: {'; '.join(error['errors'])}", 'error')
+        return redirect(url_for('cooker_learners_records'))
+    
+    if not rows:
+        return respond(False, 'No learners were provided.', 400)
+    if len(rows) > app.config['LEARNER_BATCH_MAX_ROWS']:
+        return respond(False, f"A batch can hold at most {app.config['LEARNER_BATCH_MAX_ROWS']} learners.", 413)
+    
+    clean, errors = parse_learner_batch(rows, default_meal_type)
+    if errors:
+        # Nothing is saved until the whole list is valid, so a corrected
+        # list can be resubmitted without creating duplicates
+        return respond(False, f'{len(errors)} of {len(rows)} rows are invalid. No learners were saved.', 400, errors)
+    
+    user_id = session.get('user_id')
+    today = datetime.now().date()
+    assigned_school = School.query.first()  # Default to first school for now
+    school_id = assigned_school.school_id if assigned_school else 1
+    now = datetime.utcnow()
+    
+    try:
+        keys = [(row['learner_name'], row['grade'], row['learner_number']) for row in clean]
+        learner_ids = roster_learner_ids(user_id, school_id, keys)
+        servings = [
+            {'learner_id': learner_ids[key],
+             'date_served': today, 'meal_type': row['meal_type'], 'created_at': now}
+            for key, row in zip(keys, clean)
+        ]
+        db.session.execute(insert(MealServing), servings)
+        meals = {}
+        for row in clean:
+            key = (today, school_id, user_id, row['meal_type'])
+            meals[key] = meals.get(key, 0) + 1
+        record_meals_served(meals)
+        db.session.commit()
+        broadcast_dashboard_update()
+    except Exception as e:
+        db.session.rollback()
+        return respond(False, 'Error saving learner records. Please try again.', 500)
+    
+    return respond(True, f'{len(clean)} learner records added successfully!', inserted=len(clean))
+
+def cooker_servings_for_day(cooker_id, day):
+    """A cooker's meal servings for one day with their roster entries, newest first"""
+    return MealServing.query\
+        .join(MealServing.learner)\
+        .options(contains_eager(MealServing.learner))\
+        .filter(Learner.cooker_id == cooker_id, MealServing.date_served == day)\
+        .order_by(MealServing.created_at.desc())\
+        .all()
+
 # Route to view learner records
 @app.route('/cooker/learners')
 def cooker_learners():
@@ -802,29 +1894,30 @@ def cooker_learners():
     today = datetime.now().date()
     
     # Get today's learners
-    todays_learners = Learner.query.filter_by(
-        cooker_id=user_id, 
-        date_served=today
-    ).order_by(Learner.created_at.desc()).all()
+    todays_learners = cooker_servings_for_day(user_id, today)
     
     return render_template('cooker_learners.html', 
                          learners=todays_learners, 
                          today=today)
-@app.route('/cooker/learners/delete/<int:learner_id>', methods=['POST'])
-def delete_learner(learner_id):
+@app.route('/cooker/learners/delete/<int:serving_id>', methods=['POST'])
+def delete_learner(serving_id):
     if session.get('role') != 'cooker':
         return redirect(url_for('home'))
     
-    learner = Learner.query.get_or_404(learner_id)
+    serving = MealServing.query.get_or_404(serving_id)
     
     # Ensure the learner belongs to the current cooker
-    if learner.cooker_id != session.get('user_id'):
+    if serving.learner.cooker_id != session.get('user_id'):
         flash('You can only delete your own learner records.', 'error')
         return redirect(url_for('cooker_learners_records'))
     
     try:
-        db.session.delete(learner)
+        # The learner stays on the roster; only this meal is removed
+        learner = serving.learner
+        db.session.delete(serving)
+        record_meals_served({(serving.date_served, learner.school_id, learner.cooker_id, serving.meal_type): -1})
         db.session.commit()
+        broadcast_dashboard_update()
         flash('Learner record deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -839,11 +1932,8 @@ def cooker_learners_records():
     user_id = session.get('user_id')
     today = datetime.now().date()
     
-    # Get today's learners and all learners for the current cooker
-    todays_learners = Learner.query.filter_by(
-        cooker_id=user_id, 
-        date_served=today
-    ).order_by(Learner.created_at.desc()).all()
+    # Get today's learners for the current cooker
+    todays_learners = cooker_servings_for_day(user_id, today)
     
     # Get assigned school for the cooker
     assigned_school = School.query.first()  # Modify this based on your school assignment logic
@@ -861,41 +1951,64 @@ def admin_attendance():
     # Get today's date for filtering
     today = datetime.now().date()
     
-    # Get all attendance records with cooker and school information
-    attendance_records = db.session.query(Attendance, User, School)\
-        .join(User, Attendance.cooker_id == User.user_id)\
-        .join(School, Attendance.school_id == School.school_id)\
-        .order_by(Attendance.date.desc(), Attendance.time_in.desc())\
-        .all()
+    # Today's panels are live operational views, so they read the primary
+    # Today's summary as conditional aggregates over today's rows only
+    working = (Attendance.time_in.isnot(None)) & (Attendance.time_out.is_(None))
+    finished = (Attendance.time_in.isnot(None)) & (Attendance.time_out.isnot(None))
+    summary = db.session.execute(select(
+        func.count(Attendance.cooker_id.distinct()).label('total_cookers_today'),
+        func.coalesce(func.sum(case((working, 1), else_=0)), 0).label('clocked_in_today'),
+        func.coalesce(func.sum(case((finished, 1), else_=0)), 0).label('completed_today')
+    ).where(Attendance.date == today)).one()
+    
+    total_cookers = User.query.filter_by(role='cooker').count()
     
-    # Get today's attendance summary with cooker details
+    # Cookers currently on shift, for the summary panel
     today_attendance = db.session.query(Attendance, User, School)\
         .join(User, Attendance.cooker_id == User.user_id)\
         .join(School, Attendance.school_id == School.school_id)\
-        .filter(Attendance.date == today)\
+        .filter(Attendance.date == today, working)\
+        .order_by(Attendance.time_in)\
         .all()
     
-    # Calculate stats
-    total_cookers = User.query.filter_by(role='cooker').count()
-    total_cookers_today = len(today_attendance)
-    clocked_in_today = len([att for att, user, school in today_attendance if att.time_in and not att.time_out])
-    completed_today = len([att for att, user, school in today_attendance if att.time_in and att.time_out])
-    not_clocked_in_today = total_cookers - total_cookers_today
+    # Cookers with no attendance row today (anti-join)
+    clocked_today = select(Attendance.attendance_id)\
+        .where(Attendance.cooker_id == User.user_id, Attendance.date == today)\
+        .exists()
+    pending_cookers = User.query\
+        .filter(User.role == 'cooker', ~clocked_today)\
+        .order_by(User.full_name)\
+        .all()
     
-    # Get all cookers for the pending list
-    all_cookers = User.query.filter_by(role='cooker').all()
-    cookers_with_attendance_today = [user.user_id for att, user, school in today_attendance]
-    pending_cookers = [cooker for cooker in all_cookers if cooker.user_id not in cookers_with_attendance_today]
+    # Only the history below comes from the reporting bind
+    data_as_of = use_reporting_bind()
+    
+    # One page of attendance history, newest first
+    history = lambda_stmt(lambda: select(Attendance, User, School)
+                          .join(User, Attendance.cooker_id == User.user_id)
+                          .join(School, Attendance.school_id == School.school_id))
+    page = keyset_paginate(
+        history,
+        (Attendance.date, Attendance.attendance_id),
+        (parse_iso_date, int),
+        lambda row: (row[0].date, row[0].attendance_id),
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=app.config['ATTENDANCE_PAGE_SIZE']
+    )
     
     return render_template('admin_attendance.html',
-                         attendance_records=attendance_records,
+                         attendance_records=page['items'],
+                         next_cursor=page['next_cursor'],
+                         prev_cursor=page['prev_cursor'],
                          today_attendance=today_attendance,
                          total_cookers=total_cookers,
-                         total_cookers_today=total_cookers_today,
-                         clocked_in_today=clocked_in_today,
-                         completed_today=completed_today,
-                         not_clocked_in_today=not_clocked_in_today,
+                         total_cookers_today=summary.total_cookers_today,
+                         clocked_in_today=summary.clocked_in_today,
+                         completed_today=summary.completed_today,
+                         not_clocked_in_today=len(pending_cookers),
                          pending_cookers=pending_cookers,
+                         data_as_of=data_as_of,
                          today=today)
 
 @app.route('/dashboard/delivery')
@@ -910,15 +2023,27 @@ def dashboard_delivery():
     todays_deliveries = Delivery.query.filter_by(
         delivery_guy_id=user_id,
         delivery_date=today
-    ).join(School).join(User, Delivery.cooker_id == User.user_id).order_by(Delivery.delivery_date).all()
+    ).join(School).join(User, Delivery.cooker_id == User.user_id)\
+        .options(contains_eager(Delivery.school), contains_eager(Delivery.cooker))\
+        .order_by(Delivery.delivery_date).all()
+    
+    # Completed stops first, then the remaining stops in optimized route order
+    completed = sorted(
+        (d for d in todays_deliveries if d.status == 'Delivered'),
+        key=lambda d: d.delivered_time or datetime.min
+    )
+    pending_deliveries = optimize_delivery_route(
+        [d for d in todays_deliveries if d.status == 'Pending'],
+        route_start_location(completed)
+    )
+    todays_deliveries = completed + pending_deliveries
     
     # Calculate real stats
     total_deliveries = len(todays_deliveries)
-    completed_deliveries = len([d for d in todays_deliveries if d.status == 'Delivered'])
-    pending_deliveries = [d for d in todays_deliveries if d.status == 'Pending']
+    completed_deliveries = len(completed)
     
-    # Find current delivery (first pending delivery)
-    current_delivery = next((d for d in todays_deliveries if d.status == 'Pending'), None)
+    # Find current delivery (next stop on the route)
+    current_delivery = pending_deliveries[0] if pending_deliveries else None
     
     # Get grocery items for current delivery if exists
     current_grocery_items = []
@@ -1006,18 +2131,11 @@ def calculate_avg_delivery_time(user_id):
     return round(total_minutes / len(delivered_today))
 
 def prepare_map_data(deliveries):
-    """Prepare realistic map data for Johannesburg area"""
-    # Johannesburg coordinates (center)
-    jhb_center = (-26.2041, 28.0473)
-    
+    """Prepare map data from the stored delivery coordinates"""
     map_data = []
-    for i, delivery in enumerate(deliveries):
-        # Generate realistic coordinates around Johannesburg
-        lat_variation = random.uniform(-0.1, 0.1)
-        lng_variation = random.uniform(-0.1, 0.1)
-        
-        lat = jhb_center[0] + lat_variation
-        lng = jhb_center[1] + lng_variation
+    for delivery in deliveries:
+        # Stops that could not be geocoded are listed without a marker
+        lat, lng = delivery_coordinates(delivery) or (None, None)
         
         map_data.append({
             'name': delivery.school.school_name,
@@ -1069,11 +2187,11 @@ def delivery_my_deliveries():
     status_filter = request.args.get('status', '')
     date_filter = request.args.get('date', '')
     
-    # Enhanced query to include cooker information
+    # Enhanced query to include school and cooker information
     query = Delivery.query.filter_by(delivery_guy_id=user_id)\
         .join(School)\
         .join(User, Delivery.cooker_id == User.user_id)\
-        .options(db.joinedload(Delivery.cooker))
+        .options(contains_eager(Delivery.school), contains_eager(Delivery.cooker))
     
     # Apply filters
     if status_filter:
@@ -1100,13 +2218,14 @@ def delivery_my_deliveries():
         error_out=False
     )
     
-    # Get grocery items for each delivery
+    # Get grocery items for every cooker on the page in one IN query
+    items_by_cooker = grocery_items_by_cooker({delivery.cooker_id for delivery in deliveries_pagination.items})
+    
     deliveries_with_groceries = []
     for delivery in deliveries_pagination.items:
-        grocery_items = GroceryItem.query.filter_by(cooker_id=delivery.cooker_id).all()
         deliveries_with_groceries.append({
             'delivery': delivery,
-            'grocery_items': grocery_items
+            'grocery_items': items_by_cooker.get(delivery.cooker_id, [])
         })
     
     return render_template('delivery_my_deliveries.html',
@@ -1115,6 +2234,14 @@ def delivery_my_deliveries():
                          status_filter=status_filter,
                          date_filter=date_filter)
 
+def grocery_items_by_cooker(cooker_ids):
+    """{cooker_id: [GroceryItem, ...]} for several cookers in one IN query"""
+    items_by_cooker = {}
+    if cooker_ids:
+        for item in GroceryItem.query.filter(GroceryItem.cooker_id.in_(cooker_ids)).order_by(GroceryItem.item_id):
+            items_by_cooker.setdefault(item.cooker_id, []).append(item)
+    return items_by_cooker
+
 @app.route('/delivery/history')
 def delivery_history():
     if session.get('role') != 'delivery':
@@ -1135,19 +2262,26 @@ def delivery_routes():
         delivery_guy_id=user_id,
         delivery_date=today,
         status='Pending'
-    ).join(School).order_by(Delivery.delivery_date).all()
+    ).join(School).options(contains_eager(Delivery.school)).order_by(Delivery.delivery_date).all()
     
     # Get completed deliveries for today
     completed_deliveries = Delivery.query.filter_by(
         delivery_guy_id=user_id,
         delivery_date=today,
         status='Delivered'
-    ).join(School).order_by(Delivery.delivered_time).all()
+    ).join(School).options(contains_eager(Delivery.school)).order_by(Delivery.delivered_time).all()
+    
+    # Visit the pending stops in optimized order from where the driver is now
+    pending_deliveries = optimize_delivery_route(
+        pending_deliveries,
+        route_start_location(completed_deliveries)
+    )
     
     # Prepare delivery data for the map
     delivery_locations = []
     
     for delivery in pending_deliveries:
+        latitude, longitude = delivery_coordinates(delivery) or (None, None)
         delivery_locations.append({
             'school_name': delivery.school.school_name,
             'address': delivery.location,
@@ -1155,11 +2289,12 @@ def delivery_routes():
             'contact_number': delivery.school.contact_number,
             'status': 'pending',
             'delivery_id': delivery.delivery_id,
-            'latitude': None,  # You'll need to geocode these addresses
-            'longitude': None  # You'll need to geocode these addresses
+            'latitude': latitude,
+            'longitude': longitude
         })
     
     for delivery in completed_deliveries:
+        latitude, longitude = delivery_coordinates(delivery) or (None, None)
         delivery_locations.append({
             'school_name': delivery.school.school_name,
             'address': delivery.location,
@@ -1168,8 +2303,8 @@ def delivery_routes():
             'status': 'completed',
             'delivery_id': delivery.delivery_id,
             'delivered_time': delivery.delivered_time.strftime('%H:%M') if delivery.delivered_time else None,
-            'latitude': None,
-            'longitude': None
+            'latitude': latitude,
+            'longitude': longitude
         })
     
     return render_template('delivery_routes.html',
@@ -1185,200 +2320,579 @@ def delivery_performance():
     # Implementation for performance tracking
     return render_template('delivery_performance.html')
 
+def parse_delivery_time(delivery, value):
+    """HH:MM entered by the driver, on the delivery's date"""
+    return datetime.combine(delivery.delivery_date, datetime.strptime(value, '%H:%M').time())
+
+def parse_device_timestamp(value):
+    """ISO timestamp from a device as naive UTC, like utcnow(), or None"""
+    if not value:
+        return None
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def complete_delivery(delivery, delivered_datetime, notes='', has_issues=False):
+    """Mark a delivery as delivered with the driver's notes"""
+    delivery.status = 'Delivered'
+    delivery.delivered_time = delivered_datetime
+    
+    if notes:
+        delivery.remarks = notes
+    
+    if has_issues:
+        issue_text = f"ISSUES REPORTED: {notes}" if notes else "ISSUES REPORTED: No details provided"
+        delivery.remarks = issue_text
+
 # API endpoint for completing deliveries
 @app.route('/api/delivery/complete', methods=['POST'])
 def api_complete_delivery():
     if session.get('role') != 'delivery':
-        print("❌ Unauthorized access attempt to complete delivery")
+        event_log.warning('delivery_complete_unauthorized', user_id=session.get('user_id'))
         return jsonify({'success': False, 'message': 'Unauthorized'})
     
     try:
         data = request.get_json()
-        print(f"📦 Received delivery completion data: {data}")
+        event_log.debug('delivery_complete_received', user_id=session.get('user_id'), payload=data)
         
         delivery_id = data.get('delivery_id')
         delivery_time = data.get('delivery_time')
         notes = data.get('notes', '')
         has_issues = data.get('has_issues', False)
         
-        print(f"🔍 Looking for delivery ID: {delivery_id} for user: {session.get('user_id')}")
-        
         delivery = Delivery.query.get(delivery_id)
         if not delivery:
-            print(f"❌ Delivery {delivery_id} not found")
+            event_log.warning('delivery_complete_not_found', delivery_id=delivery_id, user_id=session.get('user_id'))
             return jsonify({'success': False, 'message': 'Delivery not found'})
         
         if delivery.delivery_guy_id != session.get('user_id'):
-            print(f"❌ User {session.get('user_id')} not authorized for delivery {delivery_id}")
+            event_log.warning('delivery_complete_forbidden', delivery_id=delivery_id, user_id=session.get('user_id'))
             return jsonify({'success': False, 'message': 'Not authorized for this delivery'})
         
         # Parse delivery time
         if delivery_time:
             try:
-                time_obj = datetime.strptime(delivery_time, '%H:%M').time()
-                delivered_datetime = datetime.combine(delivery.delivery_date, time_obj)
-                print(f"⏰ Parsed delivery time: {delivered_datetime}")
-            except ValueError as e:
-                print(f"❌ Time parsing error: {e}")
+                delivered_datetime = parse_delivery_time(delivery, delivery_time)
+            except ValueError:
+                event_log.info('delivery_complete_bad_time', delivery_id=delivery_id, delivery_time=delivery_time)
                 return jsonify({'success': False, 'message': 'Invalid time format'})
         else:
             delivered_datetime = datetime.utcnow()
-            print(f"⏰ Using current time: {delivered_datetime}")
         
         # Update delivery
-        delivery.status = 'Delivered'
-        delivery.delivered_time = delivered_datetime
-        
-        if notes:
-            delivery.remarks = notes
-            print(f"📝 Added notes: {notes}")
-        
-        if has_issues:
-            issue_text = f"ISSUES REPORTED: {notes}" if notes else "ISSUES REPORTED: No details provided"
-            delivery.remarks = issue_text
-            print(f"⚠️ Marked as having issues: {issue_text}")
+        complete_delivery(delivery, delivered_datetime, notes, has_issues)
         
         # Commit changes
         db.session.commit()
-        print(f"✅ Successfully marked delivery {delivery_id} as delivered")
+        broadcast_dashboard_update()
+        event_log.info('delivery_completed', delivery_id=delivery_id, user_id=session.get('user_id'),
+                       delivered_time=delivered_datetime, has_issues=bool(has_issues))
         
         return jsonify({'success': True})
         
+    except StaleDataError:
+        db.session.rollback()
+        event_log.info('delivery_complete_conflict', delivery_id=delivery_id, user_id=session.get('user_id'))
+        return jsonify({'success': False, 'message': 'This delivery was just changed by dispatch. Please refresh and try again.'})
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Database error: {str(e)}")
+        event_log.exception('delivery_complete_failed', user_id=session.get('user_id'))
         return jsonify({'success': False, 'message': f'Database error: {str(e)}'})
 
+# Offline sync for delivery drivers
+# The driver pages queue completions and notes on the device and send them in
+# batches whenever there is signal. Each item carries a client_id, and applied
+# items are recorded, so a batch that is resent after a lost response only
+# reports the earlier outcome.
+DELIVERY_SYNC_KINDS = ('complete', 'note')
+
+def apply_delivery_sync_item(item, delivery, recorded_at):
+    """Apply one queued update to its delivery; returns an error message or None"""
+    kind = item.get('type')
+    if kind not in DELIVERY_SYNC_KINDS:
+        return f"Unknown update type {kind!r}"
+    notes = str(item.get('notes') or '').strip()
+    
+    if kind == 'note':
+        if not notes:
+            return 'Note is empty'
+        delivery.remarks = notes
+        return None
+    
+    if delivery.status == 'Delivered':
+        return 'Delivery was already completed'
+    if item.get('delivery_time'):
+        try:
+            delivered_datetime = parse_delivery_time(delivery, item['delivery_time'])
+        except ValueError:
+            return 'Invalid time format'
+    else:
+        delivered_datetime = recorded_at or datetime.utcnow()
+    complete_delivery(delivery, delivered_datetime, notes, bool(item.get('has_issues')))
+    return None
+
+@app.route('/api/delivery/sync', methods=['POST'])
+def api_delivery_sync():
+    if session.get('role') != 'delivery':
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    
+    user_id = session.get('user_id')
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return jsonify({'success': False, 'message': 'Expected a JSON body with an items list'}), 400
+    if len(items) > app.config['DELIVERY_SYNC_MAX_ITEMS']:
+        return jsonify({'success': False,
+                        'message': f"Send at most {app.config['DELIVERY_SYNC_MAX_ITEMS']} items per request"}), 413
+    
+    # Pages read ids from data attributes, so accept them as numeric strings
+    for item in items:
+        if isinstance(item.get('delivery_id'), str) and item['delivery_id'].isdigit():
+            item['delivery_id'] = int(item['delivery_id'])
+    
+    # Earlier applications of these items and their deliveries, one query each
+    client_ids = {str(item.get('client_id') or '')[:64] for item in items}
+    applied = {
+        row.client_id: row for row in DeliverySyncItem.query.filter(
+            DeliverySyncItem.delivery_guy_id == user_id,
+            DeliverySyncItem.client_id.in_(client_ids)
+        )
+    }
+    delivery_ids = {item.get('delivery_id') for item in items if isinstance(item.get('delivery_id'), int)}
+    deliveries = {
+        delivery.delivery_id: delivery
+        for delivery in Delivery.query.filter(Delivery.delivery_id.in_(delivery_ids))
+    } if delivery_ids else {}
+    
+    results = []
+    for item in items:
+        client_id = str(item.get('client_id') or '')[:64]
+        delivery_id = item.get('delivery_id')
+        result = {'client_id': client_id, 'delivery_id': delivery_id}
+        results.append(result)
+        
+        if not client_id:
+            result.update(status='rejected', message='Missing client_id')
+            continue
+        if client_id in applied:
+            result.update(status='replayed', delivery_id=applied[client_id].delivery_id)
+            continue
+        
+        delivery = deliveries.get(delivery_id)
+        if delivery is None or delivery.delivery_guy_id != user_id:
+            result.update(status='rejected', message='Delivery not found')
+            continue
+        try:
+            recorded_at = parse_device_timestamp(item.get('recorded_at'))
+        except (TypeError, ValueError):
+            result.update(status='rejected', message='Invalid recorded_at timestamp')
+            continue
+        
+        error = apply_delivery_sync_item(item, delivery, recorded_at)
+        if error:
+            result.update(status='rejected', message=error)
+            continue
+        applied[client_id] = DeliverySyncItem(
+            delivery_guy_id=user_id,
+            client_id=client_id,
+            delivery_id=delivery_id,
+            kind=item['type'],
+            recorded_at=recorded_at
+        )
+        db.session.add(applied[client_id])
+        result['status'] = 'applied'
+    
+    # Everything that applied is committed together
+    try:
+        db.session.commit()
+    except StaleDataError:
+        # A delivery changed under the batch; nothing was saved, and the
+        # device keeps its queue and sends it again against the fresh rows
+        db.session.rollback()
+        event_log.info('delivery_sync_conflict', user_id=user_id, items=len(items))
+        return jsonify({'success': False, 'message': 'A delivery changed while syncing, please retry'}), 409
+    except Exception:
+        db.session.rollback()
+        event_log.exception('delivery_sync_failed', user_id=user_id, items=len(items))
+        return jsonify({'success': False, 'message': 'Could not save the updates, please retry'}), 500
+    
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    if counts.get('applied'):
+        broadcast_dashboard_update()
+    event_log.info('delivery_sync', user_id=user_id, **counts)
+    
+    return jsonify({'success': True, 'results': results})
+
 @app.route('/admin/learner-records')
 def admin_learner_records():
     if session.get('role') != 'admin':
         return redirect(url_for('home'))
     
+    data_as_of = use_reporting_bind()
+    
     # Get filter parameters from request
     date_filter = request.args.get('date', '')
     school_filter = request.args.get('school', '')
     cooker_filter = request.args.get('cooker', '')
     
-    # Base query with joins to get learner, cooker, and school information
-    query = db.session.query(Learner, User, School)\
-        .join(User, Learner.cooker_id == User.user_id)\
-        .join(School, Learner.school_id == School.school_id)
-    
-    # Apply filters
+    filters = {'date_served': None, 'school_id': None, 'cooker_id': None}
     if date_filter:
         try:
-            filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
-            query = query.filter(Learner.date_served == filter_date)
+            filters['date_served'] = datetime.strptime(date_filter, '%Y-%m-%d').date()
         except ValueError:
             flash('Invalid date format', 'error')
-    
-    if school_filter:
-        query = query.filter(Learner.school_id == school_filter)
-    
-    if cooker_filter:
-        query = query.filter(Learner.cooker_id == cooker_filter)
-    
-    # Get filtered results ordered by date
-    learner_records = query.order_by(Learner.date_served.desc(), Learner.created_at.desc()).all()
+    for value, key, label in ((school_filter, 'school_id', 'school'), (cooker_filter, 'cooker_id', 'cooker')):
+        if value:
+            try:
+                filters[key] = int(value)
+            except ValueError:
+                flash(f'Invalid {label} filter', 'error')
+    
+    # One page of records, newest first
+    page = keyset_paginate(
+        learner_records_statement(filters),
+        (MealServing.date_served, MealServing.serving_id),
+        (parse_iso_date, int),
+        lambda row: (row[0].date_served, row[0].serving_id),
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=app.config['LEARNER_RECORDS_PAGE_SIZE']
+    )
     
     # Get all schools and cookers for filter dropdowns
     all_schools = School.query.order_by(School.school_name).all()
     all_cookers = User.query.filter_by(role='cooker').order_by(User.full_name).all()
     
-    # Calculate statistics
-    total_learners = len(learner_records)
-    
-    # Count by meal type for current results
-    meal_type_counts = {}
-    for learner, cooker, school in learner_records:
-        meal_type = learner.meal_type
-        meal_type_counts[meal_type] = meal_type_counts.get(meal_type, 0) + 1
+    # Total and per-meal-type counts over every matching record
+    meal_type_counts = learner_meal_type_counts(filters)
+    total_learners = sum(meal_type_counts.values())
     
     return render_template('admin_learner_records.html',
-                         learner_records=learner_records,
+                         learner_records=page['items'],
+                         next_cursor=page['next_cursor'],
+                         prev_cursor=page['prev_cursor'],
                          total_learners=total_learners,
                          meal_type_counts=meal_type_counts,
                          all_schools=all_schools,
                          all_cookers=all_cookers,
                          date_filter=date_filter,
                          school_filter=school_filter,
-                         cooker_filter=cooker_filter)
+                         cooker_filter=cooker_filter,
+                         data_as_of=data_as_of)
+
+# Learner record queries
+def apply_learner_record_filters(stmt, filters):
+    """Extend a lambda statement with the active learner record filters"""
+    date_served, school_id, cooker_id = filters['date_served'], filters['school_id'], filters['cooker_id']
+    
+    if date_served is not None:
+        stmt += lambda s: s.where(MealServing.date_served == date_served)
+    if school_id is not None:
+        stmt += lambda s: s.where(Learner.school_id == school_id)
+    if cooker_id is not None:
+        stmt += lambda s: s.where(Learner.cooker_id == cooker_id)
+    return stmt
+
+def learner_records_statement(filters):
+    """(MealServing, Learner, User, School) rows matching the learner record filters"""
+    stmt = lambda_stmt(lambda: select(MealServing, Learner, User, School)
+                       .join(Learner, MealServing.learner_id == Learner.learner_id)
+                       .join(User, Learner.cooker_id == User.user_id)
+                       .join(School, Learner.school_id == School.school_id))
+    return apply_learner_record_filters(stmt, filters)
+
+def learner_meal_type_counts(filters):
+    """Matching learner records per meal type, summed from the daily rollup"""
+    date_served, school_id, cooker_id = filters['date_served'], filters['school_id'], filters['cooker_id']
+    
+    stmt = lambda_stmt(lambda: select(MealsServedDaily.meal_type, func.sum(MealsServedDaily.meals)))
+    if date_served is not None:
+        stmt += lambda s: s.where(MealsServedDaily.date_served == date_served)
+    if school_id is not None:
+        stmt += lambda s: s.where(MealsServedDaily.school_id == school_id)
+    if cooker_id is not None:
+        stmt += lambda s: s.where(MealsServedDaily.cooker_id == cooker_id)
+    stmt += lambda s: s.group_by(MealsServedDaily.meal_type).order_by(MealsServedDaily.meal_type)
+    return {meal_type: count for meal_type, count in db.session.execute(stmt).all()}
+
+# Keyset pagination
+# Pages are addressed by the sort key of their edge rows, so fetching any page
+# costs one index range scan instead of skipping OFFSET rows.
+def encode_cursor(values):
+    """Encode a row's sort key as an opaque URL-safe token"""
+    raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token, parsers):
+    """Decode a cursor token with one parser per sort column, or None if invalid"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        values = json.loads(raw)
+        if len(values) != len(parsers):
+            return None
+        return tuple(parse(value) for parse, value in zip(parsers, values))
+    except (ValueError, TypeError):
+        return None
+
+def keyset_paginate(stmt, columns, parsers, row_key, after=None, before=None, per_page=50):
+    """
+    Fetch one page of a lambda statement ordered by columns, newest first.
+    after/before are cursor tokens from a previous page's next/prev links.
+    Returns a dict with the page rows and the cursors for its neighbours.
+    """
+    after_key = decode_cursor(after, parsers)
+    before_key = decode_cursor(before, parsers) if after_key is None else None
+    key = tuple_(*columns)
+    limit = per_page + 1
+    
+    # SQL elements built outside the lambdas keep the statement cacheable;
+    # the cursor values travel as bound parameters
+    if before_key is not None:
+        # Walk backwards from the cursor, then restore newest-first order
+        bound = tuple_(*[literal(value) for value in before_key])
+        ordering = [column.asc() for column in columns]
+        stmt += lambda s: s.where(key > bound)
+    else:
+        ordering = [column.desc() for column in columns]
+        if after_key is not None:
+            bound = tuple_(*[literal(value) for value in after_key])
+            stmt += lambda s: s.where(key < bound)
+    stmt += lambda s: s.order_by(*ordering).limit(limit)
+    rows = db.session.execute(stmt).all()
+    
+    if before_key is not None:
+        items = list(reversed(rows[:per_page]))
+        has_newer, has_older = len(rows) > per_page, True
+    else:
+        items = rows[:per_page]
+        has_newer, has_older = after_key is not None, len(rows) > per_page
+    
+    return {
+        'items': items,
+        'next_cursor': encode_cursor(row_key(items[-1])) if items and has_older else None,
+        'prev_cursor': encode_cursor(row_key(items[0])) if items and has_newer else None
+    }
+
+def parse_iso_datetime(value):
+    return datetime.fromisoformat(value)
+
+def parse_iso_date(value):
+    return datetime.fromisoformat(value).date()
+
+# Delivery report queries
+# Reports, exports and report jobs parse their filters here once and build
+# lambda statements, so SQLAlchemy reuses the compiled SQL for every
+# request with the same set of active filters.
+DELIVERY_REPORT_FILTER_KEYS = ('start_date', 'end_date', 'status', 'school', 'delivery_guy')
+
+def parse_delivery_report_filters(args):
+    """Parse report filter arguments into typed values plus any errors"""
+    raw = {key: args.get(key) or '' for key in DELIVERY_REPORT_FILTER_KEYS}
+    filters = {
+        'args': raw,
+        'errors': [],
+        'start_date': None,
+        'end_date': None,
+        'status': raw['status'] or None,
+        'school_id': None,
+        'delivery_guy_id': None
+    }
+    
+    for key, label in (('start_date', 'start date'), ('end_date', 'end date')):
+        if raw[key]:
+            try:
+                filters[key] = datetime.strptime(raw[key], '%Y-%m-%d').date()
+            except ValueError:
+                filters['errors'].append(f'Invalid {label} format')
+    
+    for key, target, label in (('school', 'school_id', 'school'), ('delivery_guy', 'delivery_guy_id', 'delivery person')):
+        if raw[key]:
+            try:
+                filters[target] = int(raw[key])
+            except ValueError:
+                filters['errors'].append(f'Invalid {label} filter')
+    
+    return filters
+
+def apply_delivery_report_filters(stmt, filters):
+    """Extend a lambda statement with the active report filters"""
+    start_date, end_date = filters['start_date'], filters['end_date']
+    status, school_id, delivery_guy_id = filters['status'], filters['school_id'], filters['delivery_guy_id']
+    
+    if start_date is not None:
+        stmt += lambda s: s.where(Delivery.delivery_date >= start_date)
+    if end_date is not None:
+        stmt += lambda s: s.where(Delivery.delivery_date <= end_date)
+    if status is not None:
+        stmt += lambda s: s.where(Delivery.status == status)
+    if school_id is not None:
+        stmt += lambda s: s.where(Delivery.school_id == school_id)
+    if delivery_guy_id is not None:
+        stmt += lambda s: s.where(Delivery.delivery_guy_id == delivery_guy_id)
+    return stmt
+
+def delivery_report_records_statement(filters):
+    """(Delivery, School, User) rows matching the report filters"""
+    stmt = lambda_stmt(lambda: select(Delivery, School, User)
+                       .join(School, Delivery.school_id == School.school_id)
+                       .join(User, Delivery.delivery_guy_id == User.user_id))
+    return apply_delivery_report_filters(stmt, filters)
+
+def delivery_report_export_statement(filters):
+    """Exported columns matching the report filters, newest first"""
+    stmt = lambda_stmt(lambda: select(*DELIVERY_EXPORT_FIELDS)
+                       .join(School, Delivery.school_id == School.school_id)
+                       .join(User, Delivery.delivery_guy_id == User.user_id))
+    stmt = apply_delivery_report_filters(stmt, filters)
+    stmt += lambda s: s.order_by(Delivery.delivery_date.desc(), Delivery.created_at.desc())
+    return stmt
+
+def delivery_report_summary(filters):
+    """Total, pending, delivered and on-time counts in one aggregate query"""
+    # On time means delivered on or before the delivery date
+    stmt = lambda_stmt(lambda: select(
+        func.count(Delivery.delivery_id),
+        func.coalesce(func.sum(case((Delivery.status == 'Pending', 1), else_=0)), 0),
+        func.coalesce(func.sum(case((Delivery.status == 'Delivered', 1), else_=0)), 0),
+        func.coalesce(func.sum(case((
+            (Delivery.status == 'Delivered') & Delivery.delivered_time.isnot(None)
+            & (func.date(Delivery.delivered_time) <= Delivery.delivery_date), 1), else_=0)), 0)
+    ))
+    total, pending, delivered, on_time = db.session.execute(apply_delivery_report_filters(stmt, filters)).one()
+    return {'total': total, 'pending': pending, 'delivered': delivered, 'on_time': on_time}
 
 @app.route('/admin/reports')
 def admin_reports():
     if session.get('role') != 'admin':
         return redirect(url_for('home'))
     
-    # Get filter parameters from request
-    start_date = request.args.get('start_date', '')
-    end_date = request.args.get('end_date', '')
-    status_filter = request.args.get('status', '')
-    school_filter = request.args.get('school', '')
-    delivery_guy_filter = request.args.get('delivery_guy', '')
-    
-    # Base query with joins
-    query = db.session.query(Delivery, School, User)\
-        .join(School, Delivery.school_id == School.school_id)\
-        .join(User, Delivery.delivery_guy_id == User.user_id)
-    
-    # Apply filters
-    if start_date:
-        try:
-            start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-            query = query.filter(Delivery.delivery_date >= start_date_obj)
-        except ValueError:
-            flash('Invalid start date format', 'error')
-    
-    if end_date:
-        try:
-            end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-            query = query.filter(Delivery.delivery_date <= end_date_obj)
-        except ValueError:
-            flash('Invalid end date format', 'error')
-    
-    if status_filter:
-        query = query.filter(Delivery.status == status_filter)
-    
-    if school_filter:
-        query = query.filter(Delivery.school_id == school_filter)
-    
-    if delivery_guy_filter:
-        query = query.filter(Delivery.delivery_guy_id == delivery_guy_filter)
+    data_as_of = use_reporting_bind()
     
-    # Get filtered results
-    delivery_records = query.order_by(Delivery.delivery_date.desc(), Delivery.created_at.desc()).all()
+    # Get filter parameters from request
+    filters = parse_delivery_report_filters(request.args)
+    for error in filters['errors']:
+        flash(error, 'error')
+    
+    summary = delivery_report_summary(filters)
+    on_time_rate = round((summary['on_time'] / summary['delivered'] * 100), 1) if summary['delivered'] > 0 else 0
+    
+    # One page of records, newest first
+    page = keyset_paginate(
+        delivery_report_records_statement(filters),
+        (Delivery.delivery_date, Delivery.created_at, Delivery.delivery_id),
+        (parse_iso_date, parse_iso_datetime, int),
+        lambda row: (row[0].delivery_date, row[0].created_at, row[0].delivery_id),
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=app.config['REPORTS_PAGE_SIZE']
+    )
     
     # Get all schools and delivery guys for filter dropdowns
     all_schools = School.query.order_by(School.school_name).all()
     all_delivery_guys = User.query.filter_by(role='delivery').order_by(User.full_name).all()
     
-    # Calculate statistics
-    total_deliveries = len(delivery_records)
-    pending_deliveries = len([d for d, s, u in delivery_records if d.status == 'Pending'])
-    delivered_deliveries = len([d for d, s, u in delivery_records if d.status == 'Delivered'])
-    
-    # Calculate on-time delivery rate (delivered on or before delivery date)
-    on_time_deliveries = 0
-    for delivery, school, delivery_guy in delivery_records:
-        if delivery.status == 'Delivered' and delivery.delivered_time:
-            if delivery.delivered_time.date() <= delivery.delivery_date:
-                on_time_deliveries += 1
-    
-    on_time_rate = round((on_time_deliveries / delivered_deliveries * 100), 1) if delivered_deliveries > 0 else 0
-    
     return render_template('admin_reports.html',
-                         delivery_records=delivery_records,
-                         total_deliveries=total_deliveries,
-                         pending_deliveries=pending_deliveries,
-                         delivered_deliveries=delivered_deliveries,
+                         delivery_records=page['items'],
+                         next_cursor=page['next_cursor'],
+                         prev_cursor=page['prev_cursor'],
+                         total_deliveries=summary['total'],
+                         pending_deliveries=summary['pending'],
+                         delivered_deliveries=summary['delivered'],
                          on_time_rate=on_time_rate,
                          all_schools=all_schools,
                          all_delivery_guys=all_delivery_guys,
-                         start_date=start_date,
-                         end_date=end_date,
-                         status_filter=status_filter,
-                         school_filter=school_filter,
-                         delivery_guy_filter=delivery_guy_filter)
+                         start_date=filters['args']['start_date'],
+                         end_date=filters['args']['end_date'],
+                         status_filter=filters['args']['status'],
+                         school_filter=filters['args']['school'],
+                         delivery_guy_filter=filters['args']['delivery_guy'],
+                         data_as_of=data_as_of)
+
+# Streaming delivery report export
+DELIVERY_EXPORT_HEADERS = [
+    'Delivery ID', 'School Name', 'School Location', 'Contact Person', 'Contact Number',
+    'Delivery Date', 'Delivery Address', 'Delivery Guy', 'Status', 'Delivered Time',
+    'Remarks', 'Created At'
+]
+
+DELIVERY_EXPORT_FIELDS = (
+    Delivery.delivery_id, School.school_name, School.location, School.contact_person,
+    School.contact_number, Delivery.delivery_date, Delivery.location, User.full_name,
+    Delivery.status, Delivery.delivered_time, Delivery.remarks, Delivery.created_at
+)
+
+def format_delivery_export_row(row):
+    """Turn one exported result row into spreadsheet cell values"""
+    (delivery_id, school_name, school_location, contact_person, contact_number,
+     delivery_date, address, delivery_guy, status, delivered_time, remarks, created_at) = row
+    return [
+        delivery_id,
+        school_name,
+        school_location,
+        contact_person,
+        contact_number,
+        delivery_date.strftime('%Y-%m-%d'),
+        address,
+        delivery_guy,
+        status,
+        delivered_time.strftime('%Y-%m-%d %H:%M') if delivered_time else 'N/A',
+        remarks or 'N/A',
+        created_at.strftime('%Y-%m-%d %H:%M') if created_at else 'N/A'
+    ]
+
+def iter_export_rows(stmt):
+    """Yield formatted rows from a server-side cursor, one chunk at a time"""
+    result = db.session.execute(stmt, execution_options={'yield_per': app.config['EXPORT_CHUNK_SIZE']})
+    for row in result:
+        yield format_delivery_export_row(row)
+
+def estimate_column_widths(headers, sample_rows):
+    """Size columns from the header and a sample of rows instead of every cell"""
+    widths = [len(header) for header in headers]
+    for row in sample_rows:
+        for index, value in enumerate(row):
+            widths[index] = max(widths[index], len(str(value)))
+    return [width + 2 for width in widths]
+
+def stream_csv_export(rows):
+    """Encode rows as CSV text chunks as they are produced"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(DELIVERY_EXPORT_HEADERS)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % app.config['EXPORT_CHUNK_SIZE'] == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def write_xlsx_export(rows, output):
+    """Write rows to output with openpyxl's constant-memory write-only mode"""
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Delivery Reports')
+    
+    # Column widths must be set before the first row in write-only mode
+    sample = []
+    for row in rows:
+        sample.append(row)
+        if len(sample) >= app.config['EXPORT_WIDTH_SAMPLE_ROWS']:
+            break
+    widths = estimate_column_widths(DELIVERY_EXPORT_HEADERS, sample)
+    for index, width in enumerate(widths, start=1):
+        worksheet.column_dimensions[get_column_letter(index)].width = width
+    
+    worksheet.append(DELIVERY_EXPORT_HEADERS)
+    for row in sample:
+        worksheet.append(row)
+    for row in rows:
+        worksheet.append(row)
+    workbook.save(output)
 
 @app.route('/admin/reports/export-excel')
 def export_delivery_excel():
@@ -1386,97 +2900,52 @@ def export_delivery_excel():
         return redirect(url_for('home'))
     
     # Get the same filters as the reports page
-    start_date = request.args.get('start_date', '')
-    end_date = request.args.get('end_date', '')
-    status_filter = request.args.get('status', '')
-    school_filter = request.args.get('school', '')
-    delivery_guy_filter = request.args.get('delivery_guy', '')
+    use_reporting_bind()
+    export_format = request.args.get('format', 'xlsx')
+    filters = parse_delivery_report_filters(request.args)
+    rows = iter_export_rows(delivery_report_export_statement(filters))
     
-    # Base query with joins (same as reports page)
-    query = db.session.query(Delivery, School, User)\
-        .join(School, Delivery.school_id == School.school_id)\
-        .join(User, Delivery.delivery_guy_id == User.user_id)
-    
-    # Apply filters (same as reports page)
-    if start_date:
-        try:
-            start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-            query = query.filter(Delivery.delivery_date >= start_date_obj)
-        except ValueError:
-            pass
-    
-    if end_date:
-        try:
-            end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-            query = query.filter(Delivery.delivery_date <= end_date_obj)
-        except ValueError:
-            pass
-    
-    if status_filter:
-        query = query.filter(Delivery.status == status_filter)
-    
-    if school_filter:
-        query = query.filter(Delivery.school_id == school_filter)
-    
-    if delivery_guy_filter:
-        query = query.filter(Delivery.delivery_guy_id == delivery_guy_filter)
-    
-    # Get filtered results
-    delivery_records = query.order_by(Delivery.delivery_date.desc(), Delivery.created_at.desc()).all()
-    
-    # Prepare data for Excel
-    data = []
-    for delivery, school, delivery_guy in delivery_records:
-        data.append({
-            'Delivery ID': delivery.delivery_id,
-            'School Name': school.school_name,
-            'School Location': school.location,
-            'Contact Person': school.contact_person,
-            'Contact Number': school.contact_number,
-            'Delivery Date': delivery.delivery_date.strftime('%Y-%m-%d'),
-            'Delivery Address': delivery.location,
-            'Delivery Guy': delivery_guy.full_name,
-            'Status': delivery.status,
-            'Delivered Time': delivery.delivered_time.strftime('%Y-%m-%d %H:%M') if delivery.delivered_time else 'N/A',
-            'Remarks': delivery.remarks or 'N/A',
-            'Created At': delivery.created_at.strftime('%Y-%m-%d %H:%M')
-        })
+    # Create filename with timestamp
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
-    # Create DataFrame
-    df = pd.DataFrame(data)
-    
-    # Create Excel file in memory
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Delivery Reports', index=False)
-        
-        # Auto-adjust column widths
-        worksheet = writer.sheets['Delivery Reports']
-        for column in worksheet.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = (max_length + 2)
-            worksheet.column_dimensions[column_letter].width = adjusted_width
+    if export_format == 'csv':
+        # CSV goes out to the client while rows are still being read
+        response = Response(stream_with_context(stream_csv_export(rows)), mimetype='text/csv')
+        response.headers['Content-Disposition'] = f'attachment; filename=delivery_reports_{timestamp}.csv'
+        return response
     
+    # XLSX rows are spooled to a temporary file rather than held in memory;
+    # the file is removed when the response closes it
+    output = tempfile.TemporaryFile()
+    write_xlsx_export(rows, output)
     output.seek(0)
     
-    # Create filename with timestamp
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f'delivery_reports_{timestamp}.xlsx'
-    
     return send_file(
         output,
         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
         as_attachment=True,
-        download_name=filename
+        download_name=f'delivery_reports_{timestamp}.xlsx'
     )
 
+@app.route('/admin/reports/refresh-snapshot', methods=['POST'])
+def admin_refresh_reporting_snapshot():
+    if session.get('role') != 'admin':
+        return redirect(url_for('home'))
+    
+    if reporting_uses_snapshot():
+        try:
+            taken = refresh_reporting_snapshot()
+            flash(f'Report data refreshed as of {taken:%Y-%m-%d %H:%M}', 'success')
+        except Exception:
+            event_log.exception('reporting_snapshot_failed')
+            flash('Error refreshing report data. Please try again.', 'error')
+    
+    # Only return to pages on this site
+    next_page = request.form.get('next', '')
+    if not next_page.startswith('/') or next_page.startswith('//'):
+        next_page = url_for('admin_reports')
+    return redirect(next_page)
+
 @app.route('/cooker/grocery-list')
 def cooker_grocery_list():
     if session.get('role') != 'cooker':
@@ -1513,6 +2982,7 @@ def add_grocery_item():
         
         try:
             db.session.add(new_item)
+            bump_grocery_list_versions([user_id])
             db.session.commit()
             flash('Grocery item added successfully!', 'success')
         except Exception as e:
@@ -1535,6 +3005,7 @@ def delete_grocery_item(item_id):
     
     try:
         db.session.delete(item)
+        bump_grocery_list_versions([item.cooker_id])
         db.session.commit()
         flash('Grocery item deleted successfully!', 'success')
     except Exception as e:
@@ -1553,6 +3024,7 @@ def clear_grocery_list():
     try:
         # Delete all grocery items for the current cooker
         GroceryItem.query.filter_by(cooker_id=user_id).delete()
+        bump_grocery_list_versions([user_id])
         db.session.commit()
         flash('Grocery list cleared successfully!', 'success')
     except Exception as e:
@@ -1616,6 +3088,7 @@ def admin_delete_grocery_item(item_id):
     
     try:
         db.session.delete(item)
+        bump_grocery_list_versions([item.cooker_id])
         db.session.commit()
         flash('Grocery item deleted successfully!', 'success')
     except Exception as e:
@@ -1632,6 +3105,7 @@ def clear_cooker_grocery_list(cooker_id):
     try:
         # Delete all grocery items for the specified cooker
         GroceryItem.query.filter_by(cooker_id=cooker_id).delete()
+        bump_grocery_list_versions([cooker_id])
         db.session.commit()
         flash('Grocery list cleared for selected cooker!', 'success')
     except Exception as e:
@@ -1647,7 +3121,9 @@ def clear_all_grocery_lists():
     
     try:
         # Delete all grocery items
+        cooker_ids = db.session.scalars(select(GroceryItem.cooker_id).distinct()).all()
         GroceryItem.query.delete()
+        bump_grocery_list_versions(cooker_ids)
         db.session.commit()
         flash('All grocery lists cleared successfully!', 'success')
     except Exception as e:
@@ -1656,153 +3132,754 @@ def clear_all_grocery_lists():
     
     return redirect(url_for('admin_grocery_lists'))
 
+# Delivery slip PDFs
+# Layout lives in delivery_pdf so the render workers don't import the app
+def delivery_slip_data(delivery, grocery_items):
+    """Plain values a slip is drawn from, safe to hand to a worker process"""
+    return {
+        'delivery_id': delivery.delivery_id,
+        'school_name': delivery.school.school_name,
+        'location': delivery.location,
+        'delivery_date': delivery.delivery_date.strftime('%Y-%m-%d'),
+        'delivery_guy': delivery.delivery_guy.full_name,
+        'status': delivery.status,
+        'cooker_name': delivery.cooker.full_name,
+        'cooker_phone': delivery.cooker.phone,
+        'cooker_email': delivery.cooker.email,
+        'delivered_time': delivery.delivered_time.strftime('%Y-%m-%d %H:%M') if delivery.delivered_time else None,
+        'remarks': delivery.remarks,
+        'grocery_items': [(item.item_name, item.size, item.unit, item.quantity_needed) for item in grocery_items],
+    }
+
+def build_delivery_pdf(delivery, grocery_items):
+    """Render the delivery slip with the cooker's grocery list as PDF bytes"""
+    return render_delivery_slip(delivery_slip_data(delivery, grocery_items))
+
+def bump_grocery_list_versions(cooker_ids):
+    """Record a change to these cookers' grocery lists in the current transaction"""
+    cooker_ids = sorted(set(cooker_ids))
+    if not cooker_ids:
+        return
+    stmt = upsert_insert(GroceryListVersion).values([
+        {'cooker_id': cooker_id, 'version': 1} for cooker_id in cooker_ids
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['cooker_id'],
+        set_={'version': GroceryListVersion.version + 1}
+    )
+    db.session.execute(stmt)
+
+# Rendered slips are cached on disk under (delivery, delivery version, grocery
+# list version), so any change to either produces a new file name. The least
+# recently served files are evicted once the directory outgrows its budget.
+def grocery_list_versions(cooker_ids):
+    """{cooker_id: version}; cookers whose list never changed are left out"""
+    if not cooker_ids:
+        return {}
+    return dict(db.session.execute(
+        select(GroceryListVersion.cooker_id, GroceryListVersion.version)
+            .where(GroceryListVersion.cooker_id.in_(cooker_ids))
+    ).all())
+
+def delivery_pdf_cache_path(delivery, grocery_version):
+    """Cache file for the delivery's slip at the given grocery list version"""
+    return os.path.join(
+        app.config['DELIVERY_PDF_CACHE_DIR'],
+        f'delivery_{delivery.delivery_id}_v{delivery.version}_g{grocery_version}.pdf'
+    )
+
+def read_cached_pdf(path):
+    """Cached PDF bytes, or None on a miss"""
+    try:
+        with open(path, 'rb') as cached:
+            pdf_bytes = cached.read()
+        os.utime(path)  # file mtime doubles as the last-used time
+    except FileNotFoundError:
+        return None
+    return pdf_bytes
+
+def store_cached_pdf(path, delivery_id, pdf_bytes):
+    """Write a rendered slip to the cache and evict what no longer fits"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temp_path, 'wb') as output:
+        output.write(pdf_bytes)
+    os.replace(temp_path, path)
+    
+    # Older versions of this slip can never be asked for again
+    stale_prefix = f'delivery_{delivery_id}_v'
+    entries = []
+    for entry in os.scandir(directory):
+        if not entry.name.endswith('.pdf') or entry.path == path:
+            continue
+        try:
+            if entry.name.startswith(stale_prefix):
+                os.remove(entry.path)
+            else:
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            pass  # removed by another worker
+    
+    total = len(pdf_bytes) + sum(size for _, size, _ in entries)
+    for _, size, entry_path in sorted(entries):
+        if total <= app.config['DELIVERY_PDF_CACHE_MAX_BYTES']:
+            break
+        try:
+            os.remove(entry_path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+def delivery_pdf_bytes(delivery):
+    """Delivery slip PDF, rendered only when the delivery or grocery list changed"""
+    grocery_version = grocery_list_versions([delivery.cooker_id]).get(delivery.cooker_id, 0)
+    path = delivery_pdf_cache_path(delivery, grocery_version)
+    pdf_bytes = read_cached_pdf(path)
+    if pdf_bytes is None:
+        grocery_items = GroceryItem.query.filter_by(cooker_id=delivery.cooker_id).all()
+        pdf_bytes = build_delivery_pdf(delivery, grocery_items)
+        store_cached_pdf(path, delivery.delivery_id, pdf_bytes)
+    return pdf_bytes
+
+# Day manifests
+# One download with every stop of a day, for a driver or the whole fleet.
+# Uncached slips for the ZIP download are laid out in worker processes; the
+# combined PDF is a single document and is laid out in the request.
+_pdf_render_pool = None
+
+def get_pdf_render_pool():
+    """Process pool that lays out slips away from the web workers"""
+    global _pdf_render_pool
+    if _pdf_render_pool is None:
+        # Not forked from this threaded process; see get_planner_pool
+        _pdf_render_pool = ProcessPoolExecutor(max_workers=app.config['PDF_RENDER_WORKERS'],
+                                               mp_context=multiprocessing.get_context('forkserver'))
+    return _pdf_render_pool
+
+def manifest_deliveries(delivery_date, delivery_guy_id=None):
+    """A day's deliveries per driver in stop order, with everything a slip shows"""
+    query = Delivery.query\
+        .options(selectinload(Delivery.school), selectinload(Delivery.delivery_guy), selectinload(Delivery.cooker))\
+        .filter(Delivery.delivery_date == delivery_date)
+    if delivery_guy_id is not None:
+        query = query.filter(Delivery.delivery_guy_id == delivery_guy_id)
+    by_driver = {}
+    for delivery in query.order_by(Delivery.delivery_guy_id, Delivery.delivery_id):
+        by_driver.setdefault(delivery.delivery_guy_id, []).append(delivery)
+    
+    # The same order the driver's route pages show: completed stops first,
+    # then the remaining stops in optimized route order
+    ordered = []
+    for deliveries in by_driver.values():
+        completed = sorted(
+            (d for d in deliveries if d.status == 'Delivered'),
+            key=lambda d: d.delivered_time or datetime.min
+        )
+        ordered += completed + optimize_delivery_route(
+            [d for d in deliveries if d.status != 'Delivered'],
+            route_start_location(completed)
+        )
+    return ordered
+
+def manifest_slip_pdfs(deliveries):
+    """Slip PDF bytes for each delivery, rendering cache misses in parallel"""
+    versions = grocery_list_versions({delivery.cooker_id for delivery in deliveries})
+    paths = [delivery_pdf_cache_path(delivery, versions.get(delivery.cooker_id, 0)) for delivery in deliveries]
+    pdfs = [read_cached_pdf(path) for path in paths]
+    missing = [index for index, pdf_bytes in enumerate(pdfs) if pdf_bytes is None]
+    if not missing:
+        return pdfs
+    
+    items_by_cooker = grocery_items_by_cooker({deliveries[index].cooker_id for index in missing})
+    slips = [
+        delivery_slip_data(deliveries[index], items_by_cooker.get(deliveries[index].cooker_id, []))
+        for index in missing
+    ]
+    render = map if len(slips) == 1 else get_pdf_render_pool().map
+    for index, pdf_bytes in zip(missing, render(render_delivery_slip, slips)):
+        pdfs[index] = pdf_bytes
+        store_cached_pdf(paths[index], deliveries[index].delivery_id, pdf_bytes)
+    return pdfs
+
+def day_manifest_response(delivery_date, output_format, delivery_guy_id=None):
+    """Combined PDF or ZIP of slips for a day, or None when nothing is scheduled"""
+    deliveries = manifest_deliveries(delivery_date, delivery_guy_id)
+    if not deliveries:
+        return None
+    
+    name = f'manifest_{delivery_date.isoformat()}'
+    if delivery_guy_id is not None:
+        name += '_' + secure_filename(deliveries[0].delivery_guy.full_name)
+    
+    if output_format == 'zip':
+        # Per-stop slips, one folder per driver
+        buffer = io.BytesIO()
+        stop_numbers = {}
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for delivery, pdf_bytes in zip(deliveries, manifest_slip_pdfs(deliveries)):
+                stop_number = stop_numbers[delivery.delivery_guy_id] = stop_numbers.get(delivery.delivery_guy_id, 0) + 1
+                folder = secure_filename(delivery.delivery_guy.full_name) or str(delivery.delivery_guy_id)
+                archive.writestr(
+                    f'{folder}/{stop_number:02d}_{secure_filename(delivery.school.school_name)}_{delivery.delivery_id}.pdf',
+                    pdf_bytes
+                )
+        buffer.seek(0)
+        return send_file(buffer, mimetype='application/zip', as_attachment=True, download_name=f'{name}.zip')
+    
+    items_by_cooker = grocery_items_by_cooker({delivery.cooker_id for delivery in deliveries})
+    sections = {}
+    for delivery in deliveries:
+        _, slips = sections.setdefault(delivery.delivery_guy_id, (delivery.delivery_guy.full_name, []))
+        slips.append(delivery_slip_data(delivery, items_by_cooker.get(delivery.cooker_id, [])))
+    title = f"MANQINENYATHI FOOD SUPPLY - DAY MANIFEST {delivery_date.isoformat()}"
+    # One document has to be laid out in one pass, so there is nothing to
+    # split across the pool; render it here
+    pdf_bytes = render_day_manifest(title, list(sections.values()))
+    return send_file(io.BytesIO(pdf_bytes), mimetype='application/pdf', as_attachment=True, download_name=f'{name}.pdf')
+
+def parse_manifest_date(value):
+    """Manifest date from the query string, today when left blank"""
+    if not value:
+        return datetime.now().date()
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+@app.route('/delivery/manifest')
+def delivery_day_manifest():
+    if session.get('role') != 'delivery':
+        return redirect(url_for('home'))
+    
+    try:
+        delivery_date = parse_manifest_date(request.args.get('date'))
+    except ValueError:
+        flash('Invalid manifest date.', 'error')
+        return redirect(url_for('delivery_my_deliveries'))
+    
+    response = day_manifest_response(delivery_date, request.args.get('format', 'pdf'), session.get('user_id'))
+    if response is None:
+        flash(f'You have no deliveries on {delivery_date.isoformat()}.', 'error')
+        return redirect(url_for('delivery_my_deliveries'))
+    return response
+
+@app.route('/admin/deliveries/manifest')
+def admin_day_manifest():
+    if session.get('role') != 'admin':
+        return redirect(url_for('home'))
+    
+    try:
+        delivery_date = parse_manifest_date(request.args.get('date'))
+    except ValueError:
+        flash('Invalid manifest date.', 'error')
+        return redirect(url_for('manage_deliveries'))
+    
+    delivery_guy_id = request.args.get('delivery_guy_id', type=int)
+    response = day_manifest_response(delivery_date, request.args.get('format', 'pdf'), delivery_guy_id)
+    if response is None:
+        flash(f'No deliveries are scheduled on {delivery_date.isoformat()}.', 'error')
+        return redirect(url_for('manage_deliveries'))
+    return response
+
 @app.route('/delivery/generate-pdf/<int:delivery_id>')
 def generate_delivery_pdf(delivery_id):
     if session.get('role') != 'delivery':
         return redirect(url_for('home'))
     
-    # Get delivery with all related information
     delivery = Delivery.query.filter_by(
         delivery_id=delivery_id,
         delivery_guy_id=session.get('user_id')
-    ).join(School).join(User, Delivery.cooker_id == User.user_id).first_or_404()
-    
-    # Get grocery items for the cooker
-    grocery_items = GroceryItem.query.filter_by(cooker_id=delivery.cooker_id).all()
-    
-    # Create PDF in memory
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch)
-    story = []
-    
-    # Define styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        spaceAfter=30,
-        textColor=colors.HexColor('#6a0dad')
-    )
+    ).first_or_404()
     
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=12,
-        spaceAfter=12,
-        textColor=colors.HexColor('#4b0082')
-    )
-    
-    normal_style = styles['Normal']
-    
-    # Title
-    story.append(Paragraph("MANQINENYATHI FOOD SUPPLY - DELIVERY REPORT", title_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Delivery Information Section
-    story.append(Paragraph("DELIVERY INFORMATION", heading_style))
-    
-    delivery_data = [
-        ["Delivery ID:", str(delivery.delivery_id)],
-        ["School:", delivery.school.school_name],
-        ["Location:", delivery.location],
-        ["Delivery Date:", delivery.delivery_date.strftime('%Y-%m-%d')],
-        ["Delivery Personnel:", delivery.delivery_guy.full_name],
-        ["Status:", delivery.status],
-        ["Assigned Cooker:", delivery.cooker.full_name],
-        ["Cooker Contact:", delivery.cooker.phone or "Not provided"],
-        ["Cooker Email:", delivery.cooker.email]
-    ]
-    
-    if delivery.delivered_time:
-        delivery_data.append(["Delivered Time:", delivery.delivered_time.strftime('%Y-%m-%d %H:%M')])
-    if delivery.remarks:
-        delivery_data.append(["Remarks:", delivery.remarks])
-    
-    delivery_table = Table(delivery_data, colWidths=[2*inch, 4*inch])
-    delivery_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f0e6ff')),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#4b0082')),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('BACKGROUND', (1, 0), (1, -1), colors.white),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-    ]))
-    
-    story.append(delivery_table)
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Grocery List Section
-    story.append(Paragraph("GROCERY LIST FOR COOKER: " + delivery.cooker.full_name.upper(), heading_style))
-    
-    if grocery_items:
-        # Prepare grocery table data
-        grocery_data = [["Item Name", "Size", "Unit", "Quantity", "Total Amount"]]
-        
-        for item in grocery_items:
-            total_amount = item.size * item.quantity_needed
-            grocery_data.append([
-                item.item_name,
-                str(item.size),
-                item.unit,
-                str(item.quantity_needed),
-                f"{total_amount} {item.unit}"
-            ])
-        
-        # Calculate totals
-        unit_totals = {}
-        for item in grocery_items:
-            unit = item.unit
-            total = item.size * item.quantity_needed
-            if unit not in unit_totals:
-                unit_totals[unit] = 0
-            unit_totals[unit] += total
-        
-        # Add totals row
-        grocery_data.append(["", "", "", "TOTALS:", ""])
-        for unit, total in unit_totals.items():
-            grocery_data.append(["", "", "", f"Total {unit}:", f"{total:.2f} {unit}"])
-        
-        grocery_table = Table(grocery_data, colWidths=[2*inch, 0.8*inch, 0.8*inch, 1*inch, 1.5*inch])
-        grocery_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#6a0dad')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, -len(unit_totals)-1), (-1, -1), 'Helvetica-Bold'),
-            ('BACKGROUND', (0, -len(unit_totals)-1), (-1, -1), colors.HexColor('#f0e6ff'))
-        ]))
-        
-        story.append(grocery_table)
-    else:
-        story.append(Paragraph("No grocery items found for this cooker.", normal_style))
-    
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Footer with timestamp
-    from datetime import datetime
-    generated_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    story.append(Paragraph(f"Generated on: {generated_time}", styles['Italic']))
-    
-    # Build PDF
-    doc.build(story)
+    # Served from the slip cache unless the delivery or grocery list changed
+    pdf_bytes = delivery_pdf_bytes(delivery)
     
     # Prepare response
-    buffer.seek(0)
-    response = make_response(buffer.getvalue())
+    response = make_response(pdf_bytes)
     response.headers['Content-Type'] = 'application/pdf'
     response.headers['Content-Disposition'] = f'attachment; filename=delivery_{delivery_id}_report.pdf'
     
     return response
 
 
+# Background report jobs
+# Job rows live in report_jobs, including progress so any worker process can
+# answer a status poll, and finished files go to disk. Handlers report
+# progress every REPORT_JOB_PROGRESS_ROWS rows to keep the writes rare.
+_report_executor = None
+_report_executor_lock = threading.Lock()
+
+def report_job_dir():
+    """Directory holding finished report artifacts"""
+    path = os.path.join(app.instance_path, 'reports')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def report_worker_alive(pid):
+    """Whether another process that may still own report jobs is running"""
+    # This process has not queued anything yet, so rows carrying its pid
+    # were left by an earlier process that happened to get the same one
+    if pid is None or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # running, just under another user
+    return True
+
+def get_report_executor():
+    """Thread pool running report jobs, started on first use"""
+    global _report_executor
+    with _report_executor_lock:
+        if _report_executor is None:
+            # Jobs whose worker process has exited will never finish; other
+            # live workers' jobs are left to them
+            unfinished = ReportJob.status.in_(['Queued', 'Running'])
+            owners = db.session.execute(select(ReportJob.worker_pid).distinct().where(unfinished)).scalars().all()
+            gone = [pid for pid in owners if not report_worker_alive(pid)]
+            if gone:
+                ReportJob.query.filter(unfinished, ReportJob.worker_pid.in_(gone) | ReportJob.worker_pid.is_(None))\
+                    .update({'status': 'Failed', 'error': 'Interrupted by a server restart'},
+                            synchronize_session=False)
+            db.session.commit()
+            _report_executor = ThreadPoolExecutor(
+                max_workers=app.config['REPORT_JOB_WORKERS'],
+                thread_name_prefix='report-job'
+            )
+    return _report_executor
+
+def run_delivery_export_job(params, output_path, progress):
+    """Write a filtered delivery export to output_path"""
+    use_reporting_bind()
+    try:
+        filters = parse_delivery_report_filters(params.get('filters', {}))
+        total = delivery_report_summary(filters)['total'] or 1
+        
+        def counted(rows):
+            for count, row in enumerate(rows, start=1):
+                if count % app.config['REPORT_JOB_PROGRESS_ROWS'] == 0:
+                    progress(count * 100 // total)
+                yield row
+        
+        rows = counted(iter_export_rows(delivery_report_export_statement(filters)))
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if params.get('format') == 'csv':
+            with open(output_path, 'w', newline='', encoding='utf-8') as output:
+                for chunk in stream_csv_export(rows):
+                    output.write(chunk)
+            return f'delivery_reports_{timestamp}.csv', 'text/csv'
+        
+        with open(output_path, 'wb') as output:
+            write_xlsx_export(rows, output)
+        return (f'delivery_reports_{timestamp}.xlsx',
+                'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    finally:
+        # The job row itself is read back from the primary
+        g.pop('reporting_reads', None)
+
+def run_delivery_pdf_job(params, output_path, progress):
+    """Write a single delivery slip PDF to output_path"""
+    delivery = Delivery.query.get(params['delivery_id'])
+    if delivery is None:
+        raise ValueError('Delivery no longer exists')
+    progress(50)
+    with open(output_path, 'wb') as output:
+        output.write(delivery_pdf_bytes(delivery))
+    return f'delivery_{delivery.delivery_id}_report.pdf', 'application/pdf'
+
+REPORT_JOB_HANDLERS = {
+    'delivery_export': run_delivery_export_job,
+    'delivery_pdf': run_delivery_pdf_job,
+}
+
+def run_report_job(job_id):
+    """Worker entry point: build one job's artifact and record the outcome"""
+    with app.app_context():
+        job = ReportJob.query.get(job_id)
+        if job is None:
+            return
+        job.status = 'Running'
+        db.session.commit()
+        
+        last_reported = [0]
+        
+        def progress(percent):
+            percent = min(int(percent), 99)
+            if percent == last_reported[0]:
+                return
+            last_reported[0] = percent
+            # Own short transaction, so the handler's open reads are untouched
+            with db.engine.begin() as connection:
+                connection.execute(update(ReportJob).where(ReportJob.job_id == job_id).values(progress=percent))
+        
+        output_path = os.path.join(report_job_dir(), job_id)
+        try:
+            handler = REPORT_JOB_HANDLERS[job.kind]
+            job.download_name, job.mimetype = handler(json.loads(job.params), output_path, progress)
+            job.file_path = output_path
+            job.status = 'Done'
+        except Exception as e:
+            db.session.rollback()
+            job = ReportJob.query.get(job_id)
+            job.status = 'Failed'
+            job.error = str(e)
+            if os.path.exists(output_path):
+                os.remove(output_path)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        db.session.remove()
+
+def cleanup_expired_report_jobs():
+    """Delete jobs and artifacts older than the retention period"""
+    cutoff = datetime.utcnow() - timedelta(hours=app.config['REPORT_JOB_RETENTION_HOURS'])
+    expired = ReportJob.query.filter(
+        ReportJob.created_at < cutoff,
+        ReportJob.status.in_(['Done', 'Failed'])
+    ).all()
+    for job in expired:
+        if job.file_path and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+        db.session.delete(job)
+    db.session.commit()
+    return len(expired)
+
+def enqueue_report_job(kind, params, user_id):
+    """Record a job, hand it to the worker pool and return it immediately"""
+    cleanup_expired_report_jobs()
+    # Start the pool first so its restart sweep cannot catch this job
+    executor = get_report_executor()
+    job = ReportJob(
+        job_id=uuid.uuid4().hex,
+        kind=kind,
+        params=json.dumps(params),
+        status='Queued',
+        requested_by=user_id,
+        worker_pid=os.getpid()
+    )
+    db.session.add(job)
+    db.session.commit()
+    executor.submit(run_report_job, job.job_id)
+    return job
+
+def report_job_payload(job):
+    """JSON description of a job for status polling"""
+    progress = {'Done': 100, 'Queued': 0}.get(job.status, job.progress)
+    return {
+        'job_id': job.job_id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': progress,
+        'error': job.error,
+        'status_url': url_for('report_job_status', job_id=job.job_id),
+        'download_url': url_for('download_report_job', job_id=job.job_id) if job.status == 'Done' else None
+    }
+
+@app.cli.command('cleanup-report-jobs')
+def cleanup_report_jobs_command():
+    """Remove report jobs and files past the retention period"""
+    print(f"Removed {cleanup_expired_report_jobs()} expired report jobs")
+
+@app.route('/admin/reports/export-jobs', methods=['POST'])
+def enqueue_delivery_export():
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    
+    # Same filters as the reports page, taken from the query string
+    params = {
+        'filters': parse_delivery_report_filters(request.args)['args'],
+        'format': 'csv' if request.args.get('format') == 'csv' else 'xlsx'
+    }
+    job = enqueue_report_job('delivery_export', params, session.get('user_id'))
+    return jsonify({'success': True, **report_job_payload(job)})
+
+@app.route('/delivery/generate-pdf/<int:delivery_id>/job', methods=['POST'])
+def enqueue_delivery_pdf(delivery_id):
+    if session.get('role') != 'delivery':
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    
+    delivery = Delivery.query.filter_by(
+        delivery_id=delivery_id,
+        delivery_guy_id=session.get('user_id')
+    ).first()
+    if not delivery:
+        return jsonify({'success': False, 'message': 'Delivery not found'})
+    
+    job = enqueue_report_job('delivery_pdf', {'delivery_id': delivery_id}, session.get('user_id'))
+    return jsonify({'success': True, **report_job_payload(job)})
+
+@app.route('/jobs/<job_id>')
+def report_job_status(job_id):
+    job = ReportJob.query.get(job_id)
+    if not job or job.requested_by != session.get('user_id'):
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    return jsonify({'success': True, **report_job_payload(job)})
+
+@app.route('/jobs/<job_id>/download')
+def download_report_job(job_id):
+    job = ReportJob.query.get(job_id)
+    if not job or job.requested_by != session.get('user_id'):
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    if job.status != 'Done' or not job.file_path or not os.path.exists(job.file_path):
+        return jsonify({'success': False, 'message': 'Report is not ready'}), 409
+    
+    return send_file(
+        job.file_path,
+        mimetype=job.mimetype,
+        as_attachment=True,
+        download_name=job.download_name
+    )
+
+# Request instrumentation
+# Engine, request and template hooks feed the metrics served at /metrics.
+# Statements slower than SLOW_QUERY_THRESHOLD_MS are also logged with their SQL.
+metrics_registry = MetricsRegistry()
+REQUEST_LATENCY = metrics_registry.histogram(
+    'http_request_duration_seconds', 'Time spent handling a request', ('endpoint', 'method', 'status'))
+REQUEST_SQL_STATEMENTS = metrics_registry.histogram(
+    'http_request_sql_statements', 'SQL statements run per request', ('endpoint',), COUNT_BUCKETS)
+SQL_DURATION = metrics_registry.histogram(
+    'sql_statement_duration_seconds', 'Time spent executing SQL statements', ('endpoint',), SQL_BUCKETS)
+SLOW_QUERIES = metrics_registry.counter(
+    'sql_slow_statements_total', 'SQL statements slower than the slow query threshold', ('endpoint',))
+TEMPLATE_RENDER = metrics_registry.histogram(
+    'template_render_duration_seconds', 'Time spent rendering templates', ('template',))
+
+def _metrics_endpoint():
+    """Endpoint label for the current request, or background for jobs and CLI"""
+    if has_request_context():
+        return request.endpoint or 'unmatched'
+    return 'background'
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+    g.sql_statements = 0
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('statement_started', []).append(time.perf_counter())
+    if has_request_context():
+        g.sql_statements = g.get('sql_statements', 0) + 1
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_statement_time(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('statement_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    endpoint = _metrics_endpoint()
+    SQL_DURATION.observe(elapsed, endpoint=endpoint)
+    if elapsed * 1000 >= app.config['SLOW_QUERY_THRESHOLD_MS']:
+        SLOW_QUERIES.inc(endpoint=endpoint)
+        event_log.warning('slow_query', endpoint=endpoint, duration_ms=round(elapsed * 1000, 1),
+                          statement=' '.join(statement.split())[:500])
+
+@event.listens_for(Engine, 'handle_error')
+def _discard_statement_timer(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('statement_started'):
+        connection.info['statement_started'].pop()
+
+@before_render_template.connect_via(app)
+def _start_template_timer(sender, template, context, **extra):
+    g.template_started = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def _record_template_time(sender, template, context, **extra):
+    started = g.pop('template_started', None)
+    if started is not None:
+        TEMPLATE_RENDER.observe(time.perf_counter() - started, template=template.name or 'inline')
+
+@app.after_request
+def _record_request_metrics(response):
+    # Streamed bodies are timed up to the first byte only
+    endpoint = request.endpoint or 'unmatched'
+    started = g.get('request_started')
+    if started is not None:
+        REQUEST_LATENCY.observe(time.perf_counter() - started,
+                                endpoint=endpoint, method=request.method, status=response.status_code)
+    REQUEST_SQL_STATEMENTS.observe(g.get('sql_statements', 0), endpoint=endpoint)
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    # Scrapers must send the METRICS_TOKEN bearer token; without one
+    # configured only signed-in admins are served. The client address is no
+    # proof of a local scraper, since a reverse proxy connects from localhost.
+    token = app.config['METRICS_TOKEN']
+    authorized = bool(token) and hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode())
+    if not (authorized or session.get('role') == 'admin'):
+        return Response('Forbidden\n', status=403, mimetype='text/plain')
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+# Query audits
+# Replays the hot GET routes as each role and checks the SQL they emit:
+# audit-query-plans runs EXPLAIN QUERY PLAN on every SELECT and reports full
+# scans of tables that grow with usage, and check-query-budgets compares the
+# statement count of each route with its budget. Run both in CI against a
+# migrated database holding representative data.
+QUERY_AUDIT_LARGE_TABLES = frozenset({
+    'deliveries', 'attendance', 'learner_roster', 'meal_servings',
+    'meals_served_daily', 'grocery_items', 'report_jobs'
+})
+
+# (role, endpoint, tables the route is allowed to scan)
+QUERY_AUDIT_ROUTES = (
+    ('admin', 'dashboard_admin', ()),
+    ('admin', 'manage_deliveries', ()),
+    ('admin', 'admin_attendance', ()),
+    # Unfiltered totals sum every rollup row and every delivery by design
+    ('admin', 'admin_learner_records', ('meals_served_daily',)),
+    ('admin', 'admin_reports', ('deliveries',)),
+    # Shows every cooker's current list
+    ('admin', 'admin_grocery_lists', ('grocery_items',)),
+    ('cooker', 'dashboard_cooker', ()),
+    ('cooker', 'cooker_attendance', ()),
+    ('cooker', 'cooker_learners_records', ()),
+    ('cooker', 'cooker_grocery_list', ()),
+    ('delivery', 'dashboard_delivery', ()),
+    ('delivery', 'delivery_stats', ()),
+    ('delivery', 'delivery_my_deliveries', ()),
+    ('delivery', 'delivery_routes', ()),
+)
+
+# Most SQL statements one request to each endpoint may run. Budgets do not
+# depend on how many rows a page shows, so a lazy load in a loop fails them.
+QUERY_BUDGETS = {
+    'dashboard_admin': 5,
+    'manage_deliveries': 4,
+    'admin_attendance': 6,
+    'admin_learner_records': 5,
+    'admin_reports': 5,
+    'admin_grocery_lists': 2,
+    'dashboard_cooker': 5,
+    'cooker_attendance': 4,
+    'cooker_learners_records': 3,
+    'cooker_grocery_list': 2,
+    'dashboard_delivery': 4,
+    'delivery_stats': 4,
+    'delivery_my_deliveries': 4,
+    'delivery_routes': 3,
+}
+
+_SCAN_PATTERN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+@app.after_request
+def _check_query_budget(response):
+    budget = QUERY_BUDGETS.get(request.endpoint)
+    used = g.get('sql_statements', 0)
+    if budget is not None and used > budget:
+        event_log.warning('query_budget_exceeded', endpoint=request.endpoint, statements=used, budget=budget)
+    return response
+
+def capture_route_queries(role, endpoint, **values):
+    """Request an endpoint as the first user with role; return the SQL it ran"""
+    user = User.query.filter_by(role=role).first()
+    if user is None:
+        return None
+    
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user.user_id
+        sess['role'] = role
+        sess['full_name'] = user.full_name
+    with app.test_request_context():
+        url = url_for(endpoint, **values)
+    
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters, executemany))
+    
+    # Report routes read from the reporting bind, so listen on every engine
+    engines = list(db.engines.values())
+    # A fresh app context gives each request its own g and an empty identity
+    # map, so lazy loads are not hidden by rows an earlier request loaded
+    with app.app_context():
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', record)
+        try:
+            client.get(url)
+        finally:
+            for engine in engines:
+                event.remove(engine, 'before_cursor_execute', record)
+    return statements
+
+def full_table_scans(statement, parameters):
+    """Large tables that a statement reads without using any index"""
+    with db.engine.connect() as conn:
+        plan = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    scans = set()
+    for row in plan:
+        match = _SCAN_PATTERN.match(row[-1])
+        if match and match.group(1) in QUERY_AUDIT_LARGE_TABLES:
+            scans.add(match.group(1))
+    return scans
+
+@app.cli.command('audit-query-plans')
+def audit_query_plans_command():
+    """Fail when a hot route full-scans a large table"""
+    if db.engine.dialect.name != 'sqlite':
+        print("The query plan audit reads SQLite's EXPLAIN QUERY PLAN; point it at a SQLite copy")
+        raise SystemExit(2)
+    
+    failures = 0
+    for role, endpoint, allowed in QUERY_AUDIT_ROUTES:
+        statements = capture_route_queries(role, endpoint)
+        if statements is None:
+            print(f"SKIP {endpoint}: no {role} user to request it as")
+            continue
+        
+        if not statements:
+            print(f"FAIL {endpoint}: ran no SQL, so there was nothing to audit")
+            failures += 1
+            continue
+        
+        problems = []
+        for statement, parameters, executemany in statements:
+            if executemany or not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                continue
+            scans = full_table_scans(statement, parameters) - set(allowed)
+            if scans:
+                problems.append((sorted(scans), ' '.join(statement.split())))
+        
+        print(f"{'FAIL' if problems else 'ok  '} {endpoint}: {len(statements)} queries")
+        for tables, sql in problems:
+            print(f"     full scan of {', '.join(tables)}: {sql[:200]}")
+        failures += bool(problems)
+    
+    if failures:
+        print(f"{failures} routes scan large tables without an index or ran no SQL")
+        raise SystemExit(1)
+
+@app.cli.command('check-query-budgets')
+def check_query_budgets_command():
+    """Fail when a hot route runs more SQL statements than its budget"""
+    failures = 0
+    for role, endpoint, _ in QUERY_AUDIT_ROUTES:
+        statements = capture_route_queries(role, endpoint)
+        if statements is None:
+            print(f"SKIP {endpoint}: no {role} user to request it as")
+            continue
+        
+        if not statements:
+            print(f"FAIL {endpoint}: ran no SQL, so its queries were not captured")
+            failures += 1
+            continue
+        
+        budget = QUERY_BUDGETS[endpoint]
+        over = len(statements) > budget
+        print(f"{'FAIL' if over else 'ok  '} {endpoint}: {len(statements)} of {budget} statements")
+        if over:
+            for statement, _, _ in statements:
+                print(f"     {' '.join(statement.split())[:160]}")
+        failures += over
+    
+    if failures:
+        print(f"{failures} routes are over their query budget or ran no SQL")
+        raise SystemExit(1)
+
 @app.route('/debug/users')
 def debug_users():
     """Debug route to check if users are created"""
@@ -1821,8 +3898,8 @@ def debug_users():
 @app.route('/reset-db')
 def reset_db():
     """Reset database and create default users (for development only)"""
-    db.drop_all()
-    db.create_all()
+    db.drop_all(bind_key=None)
+    db.create_all(bind_key=None)
     init_db()
     return 'Database reset successfully!'
 
@@ -1835,7 +3912,8 @@ def logout():
 # Initialize database with hashed passwords
 def init_db():
     with app.app_context():
-        db.create_all()
+        # Only the primary; the reporting bind holds copies, not its own tables
+        db.create_all(bind_key=None)
         
         # Create default users if they don't exist
         default_users = [
@@ -1879,5 +3957,5 @@ def init_db():
 
 if __name__ == "__main__":
     with app.app_context():
-        db.create_all()
+        db.create_all(bind_key=None)
     app.run(debug=True)
\ No newline at end of file
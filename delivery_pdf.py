@@ -0,0 +1,178 @@
+"""Delivery slip and day manifest PDF layout.
+
+Everything here works on plain slip dictionaries (see delivery_slip_data
+in app.py) and only needs reportlab, so the PDF render worker processes
+import this module instead of the whole Flask app.
+"""
+import io
+from datetime import datetime
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+# Styles are built once per process; reportlab only reads them while laying out
+PDF_STYLES = getSampleStyleSheet()
+PDF_TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=PDF_STYLES['Heading1'],
+    fontSize=16,
+    spaceAfter=30,
+    textColor=colors.HexColor('#6a0dad')
+)
+PDF_HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=PDF_STYLES['Heading2'],
+    fontSize=12,
+    spaceAfter=12,
+    textColor=colors.HexColor('#4b0082')
+)
+
+
+def delivery_slip_story(slip):
+    """Flowables for one delivery slip"""
+    story = []
+    
+    styles = PDF_STYLES
+    title_style = PDF_TITLE_STYLE
+    heading_style = PDF_HEADING_STYLE
+    normal_style = styles['Normal']
+    
+    # Title
+    story.append(Paragraph("MANQINENYATHI FOOD SUPPLY - DELIVERY REPORT", title_style))
+    story.append(Spacer(1, 0.2*inch))
+    
+    # Delivery Information Section
+    story.append(Paragraph("DELIVERY INFORMATION", heading_style))
+    
+    delivery_data = [
+        ["Delivery ID:", str(slip['delivery_id'])],
+        ["School:", slip['school_name']],
+        ["Location:", slip['location']],
+        ["Delivery Date:", slip['delivery_date']],
+        ["Delivery Personnel:", slip['delivery_guy']],
+        ["Status:", slip['status']],
+        ["Assigned Cooker:", slip['cooker_name']],
+        ["Cooker Contact:", slip['cooker_phone'] or "Not provided"],
+        ["Cooker Email:", slip['cooker_email']]
+    ]
+    
+    if slip['delivered_time']:
+        delivery_data.append(["Delivered Time:", slip['delivered_time']])
+    if slip['remarks']:
+        delivery_data.append(["Remarks:", slip['remarks']])
+    
+    delivery_table = Table(delivery_data, colWidths=[2*inch, 4*inch])
+    delivery_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f0e6ff')),
+        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#4b0082')),
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('BACKGROUND', (1, 0), (1, -1), colors.white),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+    ]))
+    
+    story.append(delivery_table)
+    story.append(Spacer(1, 0.3*inch))
+    
+    # Grocery List Section
+    story.append(Paragraph("GROCERY LIST FOR COOKER: " + slip['cooker_name'].upper(), heading_style))
+    
+    grocery_items = slip['grocery_items']
+    if grocery_items:
+        # Prepare grocery table data
+        grocery_data = [["Item Name", "Size", "Unit", "Quantity", "Total Amount"]]
+        
+        for item_name, size, unit, quantity_needed in grocery_items:
+            total_amount = size * quantity_needed
+            grocery_data.append([
+                item_name,
+                str(size),
+                unit,
+                str(quantity_needed),
+                f"{total_amount} {unit}"
+            ])
+        
+        # Calculate totals
+        unit_totals = {}
+        for _, size, unit, quantity_needed in grocery_items:
+            total = size * quantity_needed
+            if unit not in unit_totals:
+                unit_totals[unit] = 0
+            unit_totals[unit] += total
+        
+        # Add totals row
+        grocery_data.append(["", "", "", "TOTALS:", ""])
+        for unit, total in unit_totals.items():
+            grocery_data.append(["", "", "", f"Total {unit}:", f"{total:.2f} {unit}"])
+        
+        grocery_table = Table(grocery_data, colWidths=[2*inch, 0.8*inch, 0.8*inch, 1*inch, 1.5*inch])
+        grocery_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#6a0dad')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, -len(unit_totals)-1), (-1, -1), 'Helvetica-Bold'),
+            ('BACKGROUND', (0, -len(unit_totals)-1), (-1, -1), colors.HexColor('#f0e6ff'))
+        ]))
+        
+        story.append(grocery_table)
+    else:
+        story.append(Paragraph("No grocery items found for this cooker.", normal_style))
+    
+    story.append(Spacer(1, 0.3*inch))
+    
+    # Footer with timestamp
+    generated_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    story.append(Paragraph(f"Generated on: {generated_time}", styles['Italic']))
+    return story
+
+
+def render_pdf(story):
+    """Lay out flowables on A4 and return the PDF bytes"""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch)
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def render_delivery_slip(slip):
+    """PDF bytes for one delivery slip"""
+    return render_pdf(delivery_slip_story(slip))
+
+
+def render_day_manifest(title, sections):
+    """One PDF with a stop list per driver, each followed by that driver's slips"""
+    story = []
+    for driver_name, slips in sections:
+        if story:
+            story.append(PageBreak())
+        story.append(Paragraph(title, PDF_TITLE_STYLE))
+        story.append(Paragraph(f"DRIVER: {driver_name.upper()} - {len(slips)} STOPS", PDF_HEADING_STYLE))
+        
+        stop_data = [["Stop", "School", "Location", "Cooker", "Status"]]
+        for stop_number, slip in enumerate(slips, start=1):
+            stop_data.append([str(stop_number), slip['school_name'], slip['location'], slip['cooker_name'], slip['status']])
+        stop_table = Table(stop_data, colWidths=[0.5*inch, 1.8*inch, 1.8*inch, 1.4*inch, 0.8*inch], repeatRows=1)
+        stop_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#6a0dad')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+        ]))
+        story.append(stop_table)
+        
+        for slip in slips:
+            story.append(PageBreak())
+            story.extend(delivery_slip_story(slip))
+    return render_pdf(story)
@@ -0,0 +1,161 @@
+"""Structured, non-blocking event logging.
+
+Events are logged as a name plus keyword fields. The request thread only
+checks the level and puts the record on a bounded queue; a QueueListener
+thread formats each record as one JSON line and writes it to a rotating
+file, flushing once the queue drains so bursts are written in batches.
+When the queue is full, events are dropped rather than making a request wait.
+
+Each process writes and rotates its own file (events.<pid>.jsonl for a
+configured events.jsonl): several processes rotating one shared file would
+append to renamed files and interleave partial lines.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record: timestamp, level, event and its fields"""
+
+    def format(self, record):
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'event': record.getMessage(),
+        }
+        payload.update(getattr(record, 'event_fields', {}))
+        if record.exc_text:
+            payload['exception'] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+class BatchedRotatingFileHandler(RotatingFileHandler):
+    """Rotating file handler that leaves flushing to the queue listener"""
+
+    def emit(self, record):
+        self._deferring = True
+        try:
+            super().emit(record)
+        finally:
+            self._deferring = False
+
+    def flush(self):
+        if not getattr(self, '_deferring', False):
+            super().flush()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that never blocks and hands records over unformatted"""
+
+    def __init__(self, log_queue, event_log):
+        super().__init__(log_queue)
+        self.event_log = event_log
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread; only the traceback has
+        # to be captured while it still exists
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.event_log.dropped += 1
+
+
+class BatchingQueueListener(QueueListener):
+    """Queue listener that flushes its handlers whenever the queue drains"""
+
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+
+
+class EventLog:
+    """Named event logger backed by a background writer thread"""
+
+    def __init__(self, name):
+        self.logger = logging.getLogger(name)
+        self.logger.propagate = False
+        self.dropped = 0
+        self._settings = None
+        self._queue = None
+        self._handlers = []
+        self._listener = None
+        self._listener_pid = None
+        self._lock = threading.Lock()
+
+    def configure(self, path, level='INFO', max_bytes=10 * 1024 * 1024, backup_count=5, queue_size=10000):
+        """Send events at level and above to rotating JSON-lines files, one per process"""
+        self.stop()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._settings = (path, max_bytes, backup_count, queue_size)
+        self.logger.setLevel(level)
+
+    def process_path(self, pid=None):
+        """File the given process (default: this one) writes its events to"""
+        root, ext = os.path.splitext(self._settings[0])
+        return f'{root}.{pid or os.getpid()}{ext}'
+
+    def _ensure_listener(self):
+        # Started lazily so every worker process (after a fork) gets its own
+        # queue, file and writer thread
+        if self._listener_pid == os.getpid() or self._settings is None:
+            return
+        with self._lock:
+            if self._listener_pid != os.getpid():
+                _, max_bytes, backup_count, queue_size = self._settings
+                file_handler = BatchedRotatingFileHandler(self.process_path(), maxBytes=max_bytes,
+                                                          backupCount=backup_count, encoding='utf-8', delay=True)
+                file_handler.setFormatter(JsonLinesFormatter())
+                self._queue = queue.Queue(maxsize=queue_size)
+                self._handlers = [file_handler]
+                self.logger.handlers[:] = [DroppingQueueHandler(self._queue, self)]
+                self._listener = BatchingQueueListener(self._queue, *self._handlers)
+                self._listener.start()
+                self._listener_pid = os.getpid()
+                atexit.register(self.stop)
+
+    def stop(self):
+        """Write out queued events and stop the writer thread"""
+        with self._lock:
+            if self._listener is not None and self._listener_pid == os.getpid():
+                self._listener.stop()
+                for handler in self._handlers:
+                    handler.flush()
+            self._listener = None
+            self._listener_pid = None
+
+    def log(self, level, event, exc_info=False, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        self._ensure_listener()
+        self.logger.log(level, event, exc_info=exc_info, extra={'event_fields': fields})
+
+    def debug(self, event, **fields):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        self.log(logging.ERROR, event, **fields)
+
+    def exception(self, event, **fields):
+        self.log(logging.ERROR, event, exc_info=True, **fields)
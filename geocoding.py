@@ -0,0 +1,79 @@
+"""Offline geocoding from a local gazetteer.
+
+Place names are loaded once from data/gazetteer.csv into a dictionary
+keyed by normalized name, and every lookup is memoized. Addresses are
+matched by their most specific known place name (suburb before town
+before city), so "12 Vilakazi St, Orlando West, Soweto" resolves to
+Orlando West. A location that is already written as "lat, lng" is used
+as-is.
+"""
+import csv
+import os
+import re
+from functools import lru_cache
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'gazetteer.csv')
+
+# Lower rank means a more specific place
+KIND_RANK = {'suburb': 0, 'town': 1, 'city': 2}
+
+# Longest place name, in words, worth trying to match
+MAX_NAME_WORDS = 4
+
+_COORDINATE_PATTERN = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*[,;]\s*(-?\d+(?:\.\d+)?)\s*$')
+
+
+def normalize_place(text):
+    """Lower-case a place name and collapse punctuation and whitespace"""
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', str(text).lower()).split())
+
+
+def parse_coordinates(text):
+    """Parse a "lat, lng" string into a coordinate pair, or None"""
+    match = _COORDINATE_PATTERN.match(str(text or ''))
+    if not match:
+        return None
+    lat, lng = float(match.group(1)), float(match.group(2))
+    if -90 <= lat <= 90 and -180 <= lng <= 180:
+        return (lat, lng)
+    return None
+
+
+@lru_cache(maxsize=None)
+def load_gazetteer(path=GAZETTEER_PATH):
+    """Load the gazetteer into a {normalized name: (lat, lng, rank)} index"""
+    index = {}
+    with open(path, newline='', encoding='utf-8') as handle:
+        for row in csv.DictReader(handle):
+            key = normalize_place(row['name'])
+            rank = KIND_RANK.get(row.get('kind', '').strip().lower(), len(KIND_RANK))
+            entry = (float(row['latitude']), float(row['longitude']), rank)
+            # Keep the most specific entry when two names normalize alike
+            if key not in index or rank < index[key][2]:
+                index[key] = entry
+    return index
+
+
+@lru_cache(maxsize=4096)
+def geocode(location, path=GAZETTEER_PATH):
+    """Resolve a free-text location to (lat, lng), or None if unknown"""
+    coords = parse_coordinates(location)
+    if coords:
+        return coords
+
+    index = load_gazetteer(path)
+    words = normalize_place(location).split()
+    best = None
+    for size in range(min(MAX_NAME_WORDS, len(words)), 0, -1):
+        for start in range(len(words) - size + 1):
+            entry = index.get(' '.join(words[start:start + size]))
+            if entry is None:
+                continue
+            # Most specific kind wins, then the longer name
+            key = (entry[2], -size)
+            if best is None or key < best[0]:
+                best = (key, entry)
+    if best is None:
+        return None
+    lat, lng, _ = best[1]
+    return (lat, lng)
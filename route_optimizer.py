@@ -0,0 +1,239 @@
+"""Delivery route optimization.
+
+Orders a driver's stops into a short open route (the driver does not have
+to return to the start). Distances are great-circle kilometres computed
+as one vectorized haversine matrix; the route is built with nearest
+neighbour and then improved with 2-opt and Or-opt moves until no move
+helps or the time budget runs out.
+"""
+import math
+import time
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Improvements smaller than this are treated as noise
+_EPSILON = 1e-9
+
+
+def haversine_distance(point1, point2):
+    """Great-circle distance in km between two (lat, lng) points"""
+    return float(haversine_matrix([point1, point2])[0, 1])
+
+
+def haversine_matrix(points):
+    """Pairwise great-circle distances in km for a list of (lat, lng) points"""
+    coords = np.radians(np.asarray(points, dtype=float).reshape(-1, 2))
+    lat = coords[:, 0][:, None]
+    lng = coords[:, 1][:, None]
+    dlat = lat - lat.T
+    dlng = lng - lng.T
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def route_length(dist, route):
+    """Total length of a route given as a sequence of matrix indices"""
+    route = np.asarray(route)
+    if len(route) < 2:
+        return 0.0
+    return float(dist[route[:-1], route[1:]].sum())
+
+
+def nearest_neighbour_route(dist, start=0):
+    """Greedy route that always drives to the closest unvisited point"""
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    visited[start] = True
+    route = [start]
+    current = start
+    for _ in range(n - 1):
+        candidates = np.where(visited, np.inf, dist[current])
+        current = int(np.argmin(candidates))
+        visited[current] = True
+        route.append(current)
+    return route
+
+
+def _two_opt_pass(dist, route, deadline):
+    """One sweep of 2-opt segment reversals; both route ends stay fixed"""
+    improved = False
+    m = len(route)
+    for i in range(1, m - 2):
+        if time.perf_counter() > deadline:
+            break
+        r = np.asarray(route)
+        js = np.arange(i + 1, m - 1)
+        a, b = r[i - 1], r[i]
+        c, d = r[js], r[js + 1]
+        delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+        best = int(np.argmin(delta))
+        if delta[best] < -_EPSILON:
+            j = int(js[best])
+            route[i:j + 1] = route[i:j + 1][::-1]
+            improved = True
+    return improved
+
+
+def _or_opt_pass(dist, route, deadline, max_segment=3):
+    """One sweep moving short segments (optionally reversed) elsewhere"""
+    improved = False
+    for length in range(1, max_segment + 1):
+        i = 1
+        while i + length < len(route):
+            if time.perf_counter() > deadline:
+                return improved
+            segment = route[i:i + length]
+            prev_node, next_node = route[i - 1], route[i + length]
+            removal_gain = (dist[prev_node, segment[0]] + dist[segment[-1], next_node]
+                            - dist[prev_node, next_node])
+
+            rest = np.asarray(route[:i] + route[i + length:])
+            u, v = rest[:-1], rest[1:]
+            forward = dist[u, segment[0]] + dist[segment[-1], v] - dist[u, v]
+            backward = dist[u, segment[-1]] + dist[segment[0], v] - dist[u, v]
+            k_forward = int(np.argmin(forward))
+            k_backward = int(np.argmin(backward))
+
+            if forward[k_forward] <= backward[k_backward]:
+                k, cost, moved = k_forward, forward[k_forward], segment
+            else:
+                k, cost, moved = k_backward, backward[k_backward], segment[::-1]
+
+            if cost - removal_gain < -_EPSILON:
+                rest = rest.tolist()
+                route[:] = rest[:k + 1] + moved + rest[k + 1:]
+                improved = True
+            else:
+                i += 1
+    return improved
+
+
+def improve_route(dist, route, time_budget):
+    """Apply 2-opt and Or-opt until no move helps or the budget is spent"""
+    deadline = time.perf_counter() + time_budget
+    route = list(route)
+    while time.perf_counter() < deadline:
+        improved = _two_opt_pass(dist, route, deadline)
+        improved = _or_opt_pass(dist, route, deadline) or improved
+        if not improved:
+            break
+    return route
+
+
+def optimize_route(start, stops, time_budget=0.25):
+    """
+    Order stops into a short open route beginning at start.
+
+    start and stops are (lat, lng) pairs. Returns the visiting order as
+    indices into stops together with the route length in km.
+    """
+    if not stops:
+        return [], 0.0
+
+    dist = haversine_matrix([start] + list(stops))
+    # A zero-cost "anywhere" end node turns the open route into a path with
+    # both ends fixed, which keeps the move evaluation simple
+    n = len(dist)
+    padded = np.zeros((n + 1, n + 1))
+    padded[:n, :n] = dist
+
+    route = nearest_neighbour_route(dist, start=0) + [n]
+    if len(stops) > 2:
+        route = improve_route(padded, route, time_budget)
+
+    order = [node - 1 for node in route[1:-1]]
+    return order, route_length(dist, route[:-1])
+
+
+def estimate_route_minutes(distance_km, stop_count, speed_kmh, service_minutes):
+    """Driving plus unloading time for a route, in minutes"""
+    return distance_km / speed_kmh * 60 + stop_count * service_minutes
+
+
+def _nearest_neighbour_length(dist, nodes):
+    """Length of a nearest-neighbour route from node 0 through nodes"""
+    sub = dist[np.ix_([0] + nodes, [0] + nodes)]
+    return route_length(sub, nearest_neighbour_route(sub))
+
+
+def _sweep_order(start, stops):
+    """Stop indices sorted by bearing from start, cut at the widest gap"""
+    points = np.asarray(stops, dtype=float)
+    angles = np.arctan2(points[:, 1] - start[1], points[:, 0] - start[0])
+    order = np.argsort(angles)
+    if len(order) > 1:
+        sorted_angles = angles[order]
+        gaps = np.diff(np.append(sorted_angles, sorted_angles[0] + 2 * np.pi))
+        order = np.roll(order, -(int(np.argmax(gaps)) + 1))
+    return [int(i) for i in order]
+
+
+def _solve_vehicle_route(task):
+    """Process pool worker: order one vehicle's stops"""
+    start, points, time_budget = task
+    return optimize_route(start, points, time_budget)
+
+
+def plan_fleet_routes(start, stops, vehicle_count, max_stops, max_minutes,
+                      service_minutes=10, speed_kmh=40, time_budget=0.25, map_func=map):
+    """
+    Split stops across a fleet and order each vehicle's route.
+
+    Stops are swept by bearing around start into balanced clusters that
+    respect the per-vehicle stop and time limits, then every cluster is
+    optimized independently through map_func (pass an executor's map to
+    solve them in parallel). Returns (routes, unassigned): routes holds one
+    dict per loaded vehicle with the visiting order as indices into stops,
+    the distance in km and the estimated minutes; unassigned lists the
+    stops that did not fit within the limits.
+    """
+    if not stops or vehicle_count < 1 or max_stops < 1:
+        return [], list(range(len(stops)))
+
+    dist = haversine_matrix([start] + list(stops))
+    target = min(max_stops, math.ceil(len(stops) / vehicle_count))
+
+    def fits(cluster, node, limit):
+        if len(cluster) >= limit:
+            return False
+        nodes = cluster + [node]
+        minutes = estimate_route_minutes(_nearest_neighbour_length(dist, nodes),
+                                         len(nodes), speed_kmh, service_minutes)
+        return minutes <= max_minutes
+
+    # Fill vehicles in sweep order up to a balanced share of the stops
+    clusters, leftovers = [[]], []
+    for index in _sweep_order(start, stops):
+        node = index + 1
+        if not fits(clusters[-1], node, target):
+            if clusters[-1] and len(clusters) < vehicle_count:
+                clusters.append([])
+            if not fits(clusters[-1], node, target):
+                leftovers.append(node)
+                continue
+        clusters[-1].append(node)
+
+    # Squeeze leftovers into the cheapest vehicle that still has room
+    unassigned = []
+    for node in leftovers:
+        candidates = [c for c in clusters if fits(c, node, max_stops)]
+        if not candidates and len(clusters) < vehicle_count:
+            clusters.append([])
+            candidates = [clusters[-1]] if fits(clusters[-1], node, max_stops) else []
+        if candidates:
+            min(candidates, key=lambda c: dist[[0] + c, node].min()).append(node)
+        else:
+            unassigned.append(node - 1)
+
+    clusters = [c for c in clusters if c]
+    tasks = [(start, [stops[node - 1] for node in cluster], time_budget) for cluster in clusters]
+    routes = []
+    for cluster, (order, distance_km) in zip(clusters, map_func(_solve_vehicle_route, tasks)):
+        routes.append({
+            'stops': [cluster[i] - 1 for i in order],
+            'distance_km': distance_km,
+            'minutes': estimate_route_minutes(distance_km, len(cluster), speed_kmh, service_minutes)
+        })
+    return routes, sorted(unassigned)